@@ -1,16 +1,33 @@
-from flask import Flask, jsonify, request, send_file
-from flask_cors import CORS
-from controllers.upload_controller import upload_bp
-from controllers.dashboard_controller import dashboard_bp
-from controllers.predictions_controller import predictions_bp
+from services.startup import phase, startup_complete
+
+# Route modules only import pandas, plotly, sklearn, XGBoost, ... on first use
+with phase("flask"):
+    from flask import Flask, jsonify, request, send_file
+    from flask_cors import CORS
+with phase("blueprints"):
+    from controllers.upload_controller import upload_bp, UPLOAD_FOLDER
+    from controllers.dashboard_controller import dashboard_bp
+    from controllers.predictions_controller import predictions_bp
+    from controllers.jobs_controller import jobs_bp
+    from controllers.metrics_controller import metrics_bp
+    from services.instrumentation import instrument_app
+    from services.warmup import start_warmup
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["Server-Timing", "X-Profile-Id", "Content-Disposition"])
+# Per-stage timings: Server-Timing headers and /metrics
+instrument_app(app)
 
 # Register Blueprints
 app.register_blueprint(upload_bp)
 app.register_blueprint(dashboard_bp)
 app.register_blueprint(predictions_bp)
+app.register_blueprint(jobs_bp)
+app.register_blueprint(metrics_bp)
+
+startup_complete()
+# Optional warm-up: WARMUP=1 before serving, WARMUP=background while serving
+start_warmup(UPLOAD_FOLDER)
 
 if __name__ == "__main__":
-    app.run(port=5001, debug=True)
\ No newline at end of file
+    app.run(port=5001, debug=True)
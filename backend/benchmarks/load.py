@@ -0,0 +1,105 @@
+"""Concurrent HTTP load against a running server, for comparing serving modes.
+
+    python backend/app.py &                                  # dev server
+    python -m benchmarks.load --paths /get_files /get_sheets_data/<file>/<sheet>
+
+    gunicorn -c backend/gunicorn.conf.py &                   # production mode
+    python -m benchmarks.load --paths ... --save gunicorn
+
+Every thread sends requests back to back for --duration seconds, cycling
+through --paths; the report has requests/second and latency percentiles.
+The exit status is 1 when any request failed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+import urllib.error
+import numpy as np
+
+from benchmarks.run import baseline_path, environment, log
+
+DEFAULT_URL = "http://localhost:5001"
+
+
+def worker(url, paths, deadline, latencies, errors, lock):
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url + path, timeout=300) as response:
+                response.read()
+            ok = True
+        except (urllib.error.URLError, OSError):
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors[0] += 1
+
+
+def run_load(url, paths, concurrency, duration):
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(url, paths, deadline, latencies, errors, lock))
+               for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    ms = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_second": round(len(latencies) / wall, 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load a running backend and report throughput")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--paths", nargs="+", default=["/get_files"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--save", help="baseline name or JSON path to write the results to")
+    args = parser.parse_args(argv)
+
+    # One untimed pass fills the server's caches
+    for path in args.paths:
+        urllib.request.urlopen(args.url + path, timeout=300).read()
+
+    results = []
+    for concurrency in args.concurrency:
+        result = run_load(args.url, args.paths, concurrency, args.duration)
+        results.append(result)
+        log(f"concurrency {concurrency:>4d}  {result['requests_per_second']:>9.1f} req/s  "
+            f"p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+            f"p99 {result['p99_ms']:>9.2f} ms  errors {result['errors']}")
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"environment": environment(), "url": args.url, "paths": args.paths,
+                       "duration": args.duration, "results": results}, f, indent=2)
+        log(f"Saved results to {path}")
+    # A failing path must not pass as a fast one
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
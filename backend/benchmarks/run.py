@@ -0,0 +1,368 @@
+"""Benchmarks for the backend pipeline stages and HTTP endpoints.
+
+Run from backend/:
+
+    python -m benchmarks.run --rows 10000 100000 --save local
+    python -m benchmarks.run --rows 10000 100000 --compare local
+
+Baselines are stored as benchmarks/baselines/<name>.json. A case whose
+request or function fails makes the run exit with status 1, and so does a
+regression against --compare (including a case that passed in the baseline
+and fails now).
+
+benchmarks/baselines/run.json is the reference run (--rows 10000 100000,
+1-vCPU VM); compare against it with --compare run on similar hardware.
+
+Each row count gets a synthetic NUU-shaped workbook (see benchmarks.synthetic).
+Stage cases call the pipeline functions directly; endpoint cases go through the
+blueprints with Flask's test client. Every case reports latency percentiles,
+throughput and the peak RSS seen while it ran.
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+import subprocess
+from urllib.parse import quote
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FOLDER = os.path.join(BACKEND_DIR, "benchmarks", "baselines")
+
+DEFAULT_ROWS = [10000, 100000, 1000000]
+DEFAULT_REPEAT = 5
+# A case is a regression when its p50 or peak RSS grows by more than this share
+DEFAULT_TOLERANCE = 0.2
+# Latencies below this are noise, never reported as regressions
+MIN_REGRESSION_MS = 2.0
+RSS_SAMPLE_SECONDS = 0.005
+SEARCH_TERM = "t-mobile"
+PAGE_SIZE = 50
+
+
+def current_rss():
+    # Resident set size in bytes; falls back to the lifetime peak off Linux
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRSS:
+    """Samples the process RSS in a background thread for the duration of a with-block."""
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def log(message):
+    # Routes print freely, so progress goes to the real stdout past the redirect
+    print(message, file=sys.__stdout__, flush=True)
+
+
+def summarize(times, rows, rss):
+    ms = np.asarray(times) * 1000
+    median_s = float(np.median(ms)) / 1000
+    return {
+        "calls": len(ms),
+        "first_ms": round(float(ms[0]), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "calls_per_second": round(1 / median_s, 2) if median_s else None,
+        "rows_per_second": int(rows / median_s) if rows and median_s else None,
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        "rss_delta_mb": round((rss.peak - rss.start) / 2 ** 20, 1)
+    }
+
+
+def measure(fn, repeat, rows=None, before=None):
+    """Time repeat calls of fn; before (untimed) runs ahead of every call, e.g. to drop caches."""
+    times = []
+    with PeakRSS() as rss:
+        for _ in range(repeat):
+            if before is not None:
+                before()
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return summarize(times, rows, rss)
+
+
+def stage_cases(filepath, sheet, rows):
+    # Pipeline functions called directly on the loaded sheet
+    from services.sheet_cache import read_sheet
+    from services.columnar_store import load_sheet
+    from services.search_index import SearchIndex
+    from services.column_normalizer import extract_json, parse_datetime, parse_dates, column_frequency
+    from services.correlation import sheet_correlation, heatmap_json
+    from services.sheet_profile import profile_sheet
+    from services.model_registry import get_model
+    from services.prediction_cache import ScoredSheet
+    from services.features import derive_features, load_or_build_features
+    from services.evaluation import evaluate
+    from controllers.predictions_controller import preprocess_sheet, predict_df, paginate, page_rows
+
+    df = read_sheet(filepath, sheet, copy=False)
+    features = preprocess_sheet(df)
+    bundle = get_model()
+    scored = ScoredSheet(*bundle.engine.predict(features))
+    index = SearchIndex(df)
+    middle = max(1, rows // PAGE_SIZE // 2)
+    corr = sheet_correlation(filepath, sheet)
+
+    return [
+        ("load_parquet", lambda: load_sheet(filepath, sheet)),
+        ("preprocess_sheet", lambda: preprocess_sheet(df)),
+        ("derive_features", lambda: derive_features(df)),
+        ("feature store read", lambda: load_or_build_features(filepath, sheet)),
+        ("engine.predict", lambda: bundle.engine.predict(features)),
+        ("evaluate", lambda: evaluate(scored, df["Chrn Flag"].to_numpy(dtype=np.float64))),
+        ("predict_df page", lambda: predict_df(df, scored, rows=page_rows(middle, PAGE_SIZE))),
+        ("predict_df full", lambda: predict_df(df, scored)),
+        ("paginate", lambda: paginate(df, middle, PAGE_SIZE)[0].astype(object).fillna("").astype(str).to_dict(orient="records")),
+        ("search_index build", lambda: SearchIndex(df)),
+        ("search_index query", lambda: index.search(SEARCH_TERM)),
+        ("extract_json map", lambda: df["sim_info"].map(extract_json)),
+        ("parse_datetime map", lambda: df["active_date"].map(parse_datetime)),
+        ("parse_dates", lambda: parse_dates(df["active_date"])),
+        ("column_frequency sim_info", lambda: column_frequency(df["sim_info"])),
+        ("column_frequency active_date", lambda: column_frequency(df["active_date"])),
+        ("sheet_correlation", lambda: sheet_correlation(filepath, sheet)),
+        ("heatmap_json", lambda: heatmap_json(corr.round(3))),
+        ("profile_sheet", lambda: profile_sheet(df))
+    ]
+
+
+def endpoint_cases(filename, sheet):
+    # (name, method, url) driven through the blueprints
+    f, s = quote(filename), quote(sheet)
+    column = lambda c: quote(c, safe="")
+    return [
+        ("GET /get_sheets", "GET", f"/get_sheets/{f}"),
+        ("GET /get_sheets_data", "GET", f"/get_sheets_data/{f}/{s}?page=2&page_size={PAGE_SIZE}"),
+        ("GET /get_sheets_data columns", "GET", f"/get_sheets_data/{f}/{s}?page=2&page_size={PAGE_SIZE}&layout=columns"),
+        ("GET /get_sheets_data search", "GET", f"/get_sheets_data/{f}/{s}?search={SEARCH_TERM}&page_size={PAGE_SIZE}"),
+        ("GET /get_all_columns", "GET", f"/get_all_columns/{f}/{s}"),
+        ("GET /get_column_frequency sim_info", "GET", f"/get_column_frequency/{f}/{s}/{column('sim_info')}"),
+        ("GET /get_column_frequency active_date", "GET", f"/get_column_frequency/{f}/{s}/{column('active_date')}"),
+        ("GET /get_correlation_heatmap", "GET", f"/get_correlation_heatmap/{f}/{s}"),
+        ("GET /get_distribution_vs_churn", "GET", f"/get_distribution_vs_churn/{f}/{s}/{column('return - activate')}"),
+        ("GET /predict_churn", "GET", f"/predict_churn/{f}/{s}?page=2"),
+        ("GET /predict_churn search", "GET", f"/predict_churn/{f}/{s}?search={SEARCH_TERM}"),
+        ("GET /predictions_stats", "GET", f"/predictions_stats/{f}/{s}"),
+        ("GET /model_accuracy", "GET", f"/model_accuracy/{f}/{s}"),
+        ("GET /download_predictions csv", "GET", f"/download_predictions/{f}/{s}?format=csv")
+    ]
+
+
+def call(client, method, url, **kwargs):
+    response = client.open(url, method=method, headers={"Accept-Encoding": "gzip, br"}, **kwargs)
+    body = response.get_data()  # drains streamed downloads too
+    if response.status_code >= 400:
+        raise BenchmarkError(f"{method} {url} -> {response.status_code}: {body[:200]!r}")
+    return body
+
+
+def upload(client, path, filename):
+    # Ingest runs as a background job, so the case waits for it to finish
+    with open(path, "rb") as f:
+        body = json.loads(call(client, "POST", "/upload", data={"files": (f, filename)},
+                               content_type="multipart/form-data"))
+    for job in body["jobs"].values():
+        while job is not None and job["finished"] is None:
+            time.sleep(0.05)
+            job = json.loads(call(client, "GET", f"/jobs/{job['job_id']}"))
+        if job is not None and job["status"] != "finished":
+            raise BenchmarkError(f"ingest of {filename} {job['status']}: {job['error']}")
+    return body
+
+
+def run_size(client, rows, args):
+    from benchmarks.synthetic import ensure_workbook, SHEET_NAME
+    from controllers.upload_controller import UPLOAD_FOLDER
+    from services.sheet_cache import invalidate_file
+
+    log(f"Preparing {rows:,d}-row workbook ...")
+    source = ensure_workbook(rows, args.seed)
+    filename = os.path.basename(source)
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    results = {}
+
+    def run(name, fn, repeat, before=None):
+        if args.only and not any(o in name for o in args.only):
+            return
+        try:
+            results[name] = measure(fn, repeat, rows, before)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+        log(format_result(rows, name, results[name]))
+
+    # Upload converts and profiles the workbook, so it always runs first
+    run("POST /upload", lambda: upload(client, source, filename), args.upload_repeat)
+    if not os.path.exists(filepath):
+        upload(client, source, filename)
+
+    # --cold drops the in-memory caches ahead of every call
+    before = (lambda: invalidate_file(filepath)) if args.cold else None
+    for name, method, url in endpoint_cases(filename, SHEET_NAME):
+        run(name, lambda: call(client, method, url), args.repeat, before)
+
+    if not args.skip_stages:
+        for name, fn in stage_cases(filepath, SHEET_NAME, rows):
+            run(f"stage {name}", fn, args.repeat)
+    return results
+
+
+def format_result(rows, name, result):
+    if "error" in result:
+        return f"{rows:>9,d}  {name:42s} ERROR {result['error']}"
+    throughput = f"{result['rows_per_second']:>12,d} rows/s" if result["rows_per_second"] else ""
+    return (f"{rows:>9,d}  {name:42s} p50 {result['p50_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms  "
+            f"p99 {result['p99_ms']:>10.2f} ms  {throughput}  peak {result['peak_rss_mb']:>8.1f} MB")
+
+
+def environment():
+    import pandas as pd
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__
+    }
+
+
+def baseline_path(name):
+    # Bare names like "local" resolve to benchmarks/baselines/local.json
+    if os.sep in name or name.endswith(".json"):
+        return os.path.abspath(name)
+    return os.path.join(BASELINE_FOLDER, f"{name}.json")
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Cases whose p50 latency or peak RSS grew by more than tolerance against the baseline."""
+    regressions = []
+    for rows, cases in results.items():
+        for name, result in cases.items():
+            old = baseline.get("results", {}).get(rows, {}).get(name)
+            if not old or "error" in old:
+                continue
+            if "error" in result:
+                regressions.append((rows, name, "error", "ok", result["error"]))
+                continue
+            if (result["p50_ms"] > old["p50_ms"] * (1 + tolerance)
+                    and result["p50_ms"] - old["p50_ms"] > MIN_REGRESSION_MS):
+                regressions.append((rows, name, "p50_ms", old["p50_ms"], result["p50_ms"]))
+            if result["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+                regressions.append((rows, name, "peak_rss_mb", old["peak_rss_mb"], result["peak_rss_mb"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark backend pipeline stages and endpoints")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--upload-repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="only run cases whose name contains one of these")
+    parser.add_argument("--cold", action="store_true", help="drop in-memory caches before every call")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--workdir", help="where uploads and the columnar store go (default: temp dir)")
+    parser.add_argument("--save", help="baseline name or JSON path to write the results to")
+    parser.add_argument("--compare", help="baseline name or JSON path to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--verbose", action="store_true", help="keep the routes' own print output")
+    args = parser.parse_args(argv)
+
+    # Upload and store folders follow the working directory, so move into a scratch
+    # one before the app is imported and leave the real uploads untouched
+    save_path = baseline_path(args.save) if args.save else None
+    compare_path = baseline_path(args.compare) if args.compare else None
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="nuu-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+
+    from app import app
+    client = app.test_client()
+
+    results = {}
+    try:
+        for rows in args.rows:
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with quiet:
+                results[str(rows)] = run_size(client, rows, args)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"environment": environment(), "repeat": args.repeat, "cold": args.cold, "results": results}
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with open(save_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {save_path}")
+
+    if compare_path:
+        with open(compare_path) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for rows, name, metric, old, new in regressions:
+            change = f"({new / old - 1:+.0%})" if metric != "error" else ""
+            print(f"REGRESSION {int(rows):>9,d}  {name:42s} {metric} {old} -> {new} {change}")
+        print(f"{len(regressions)} regression(s) against {compare_path}")
+        if regressions:
+            return 1
+
+    failed = [(rows, name) for rows, cases in results.items() for name, result in cases.items() if "error" in result]
+    for rows, name in failed:
+        print(f"FAILED {int(rows):>9,d}  {name}")
+    if failed:
+        print(f"{len(failed)} case(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Stand-in for Ollama's /api/chat, for tests and benchmarks without a model.
+
+    python -m benchmarks.stub_llm --port 11435 --delay 0.2 &
+    OLLAMA_URL=http://localhost:11435/api/chat python app.py
+
+The answer names the prompt size and echoes the question, so a caller can
+check what context was sent. With "stream": true the reply is NDJSON chunks
+like Ollama's.
+"""
+import sys
+import json
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    # Seconds between streamed chunks
+    chunk_delay = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = body.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        answer = f"Stub answer from {body.get('model')} ({len(prompt)} prompt chars): {question_of(prompt)}"
+        time.sleep(self.delay)
+
+        if body.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in answer.split(" "):
+                self.write_chunk({"model": body.get("model"), "message": {"role": "assistant", "content": word + " "},
+                                  "done": False})
+                time.sleep(self.chunk_delay)
+            self.write_chunk({"model": body.get("model"), "done": True, "prompt_eval_count": len(prompt) // 4})
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            payload = json.dumps({"model": body.get("model"), "message": {"role": "assistant", "content": answer},
+                                  "done": True, "prompt_eval_count": len(prompt) // 4}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def write_chunk(self, obj):
+        data = json.dumps(obj).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def question_of(prompt):
+    # The line after "User question:" in the ask_ai prompt, else the prompt's last line
+    lines = [line.strip() for line in prompt.strip().splitlines()]
+    if "User question:" in lines:
+        i = lines.index("User question:")
+        return lines[i + 1] if i + 1 < len(lines) else ""
+    return lines[-1] if lines else ""
+
+
+def serve(port=11435, delay=0.0, chunk_delay=0.0):
+    handler = type("Handler", (StubHandler,), {"delay": delay, "chunk_delay": chunk_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a stub Ollama /api/chat endpoint")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each answer starts")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args(argv)
+
+    server = serve(args.port, args.delay, args.chunk_delay)
+    print(f"Stub LLM on http://127.0.0.1:{args.port}/api/chat")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Generated workbooks are reused between runs (1M rows takes minutes to write)
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SHEET_NAME = "N10"
+
+CARRIERS = ["T-Mobile", "AT&T", "Verizon", "Mint Mobile", "Cricket Wireless", "Metro by T-Mobile",
+            "Visible", "Boost Mobile", "Tracfone", "US Mobile", ""]
+MODELS = ["N10", "B30 Pro", "A9L", "X6P", "B15"]
+TYPES = ["Return", "Repair", "Exchange"]
+WARRANTIES = ["Yes", "No"]
+# Reverse of column_normalizer.DIGIT_TABLE, for the rows exported with Persian digits
+PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+START_DATE = pd.Timestamp("2024-06-01")
+MISSING_DATE_RATIO = 0.03
+PERSIAN_DATE_RATIO = 0.01
+
+
+def sim_info_values(rng, rows):
+    # Mostly carrier JSON like the export, plus the plain markers and gaps seen in real sheets
+    pool = [json.dumps([{"slot_index": slot, "carrier_name": name, "mcc": "310", "mnc": f"{i:03d}"}])
+            for slot in (0, 1) for i, name in enumerate(CARRIERS)]
+    pool += ["uninserted", "inserted", "Unknown", "[]", "invalid json"]
+    weights = np.r_[np.full(len(pool) - 5, 0.9 / (len(pool) - 5)), [0.04, 0.03, 0.01, 0.01, 0.01]]
+    values = np.asarray(pool, dtype=object)[rng.choice(len(pool), size=rows, p=weights)]
+    values[rng.random(rows) < 0.02] = None
+    return values
+
+
+def date_strings(rng, dates):
+    text = dates.dt.strftime(DATE_FORMAT).astype(object)
+    persian = rng.random(len(dates)) < PERSIAN_DATE_RATIO
+    text[persian] = text[persian].str.translate(PERSIAN_DIGITS)
+    text[rng.random(len(dates)) < MISSING_DATE_RATIO] = None
+    return text
+
+
+def make_sheet(rows, seed=0):
+    """A frame shaped like an NUU export sheet: date strings, carrier JSON and a churn flag."""
+    rng = np.random.default_rng(seed)
+
+    active = START_DATE + pd.to_timedelta(rng.integers(0, 180 * 86400, rows), unit="s")
+    days_used = rng.exponential(30, rows)
+    last_boot = active + pd.to_timedelta(days_used * 86400, unit="s")
+    interval = last_boot - pd.to_timedelta(rng.normal(2, 5, rows) * 86400, unit="s")
+
+    # Devices that stop booting soon after activation churn more often
+    churn_p = 1 / (1 + np.exp((days_used - 10) / 8))
+    churn = (rng.random(rows) < churn_p).astype(np.int64)
+
+    return pd.DataFrame({
+        "Device number": np.arange(rows, dtype=np.int64) + 860000000000000,
+        "model": np.asarray(MODELS, dtype=object)[rng.integers(0, len(MODELS), rows)],
+        "sim_info": sim_info_values(rng, rows),
+        "register_email": np.where(rng.random(rows) < 0.1, np.nan, rng.integers(0, 2, rows)),
+        "active_date": date_strings(rng, pd.Series(active)),
+        "last_boot_date": date_strings(rng, pd.Series(last_boot)),
+        "interval_date": date_strings(rng, pd.Series(interval)),
+        "Type": np.asarray(TYPES, dtype=object)[rng.integers(0, len(TYPES), rows)],
+        "Warranty": np.asarray(WARRANTIES, dtype=object)[rng.integers(0, len(WARRANTIES), rows)],
+        "return - activate": np.round(rng.exponential(45, rows), 3),
+        "Chrn Flag": churn
+    })
+
+
+def workbook_path(rows, seed=0):
+    return os.path.join(DATA_FOLDER, f"nuu_{rows}_{seed}.xlsx")
+
+
+def ensure_workbook(rows, seed=0):
+    # Written once per (rows, seed), then reused
+    path = workbook_path(rows, seed)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(DATA_FOLDER, exist_ok=True)
+    tmp_path = path + ".tmp.xlsx"
+    make_sheet(rows, seed).to_excel(tmp_path, sheet_name=SHEET_NAME, index=False)
+    os.replace(tmp_path, path)
+    return path
@@ -1,11 +1,22 @@
 import os
-import pandas as pd
 import json 
-from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 import traceback
-import plotly.graph_objects as go
-import requests
+from services.job_queue import async_capable, STREAM_FLAG, TRUE_VALUES
+from services.sheet_cache import read_sheet, get_sheet_names, get_sheet_columns, delete_file_data, cache_stats
+from services.search_index import get_search_index
+from services.column_normalizer import get_column_frequency as cached_column_frequency
+from services.sheet_profile import get_sheet_profile
+from services.retrieval_index import get_retrieval_index
+from services.llm_client import llm_client, answer_cache, answer_key, LLMError, LLMBusy
+from services.upload_store import content_index
+from services.correlation import get_heatmap_json
+from services.churn_distribution import get_distribution_json
+from services.json_response import json_response, columnar
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+go = lazy_import("plotly.graph_objects")
 
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 
@@ -22,6 +33,7 @@ def delete_file(file):
         filepath = os.path.join(UPLOAD_FOLDER, file)
         if os.path.exists(filepath):
             os.remove(filepath)
+            delete_file_data(filepath)
             return jsonify({"message": f"{file} deleted successfully"}), 200
         else:
             return jsonify({"error": "File not found"}), 404
@@ -35,18 +47,21 @@ def get_sheets(file):
         return jsonify({"error": "File not found"}), 404
 
     try:
-        xl = pd.ExcelFile(filepath)
-        sheet_names = xl.sheet_names
-        xl.close()
+        sheet_names = get_sheet_names(filepath)
         return jsonify({"sheets": sheet_names})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def paginate(df, page, page_size):
-    total = len(df)
+@dashboard_bp.route("/cache_stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(cache_stats()), 200
+
+def page_rows(page, page_size):
     start = (page - 1) * page_size
-    end = start + page_size
-    return df.iloc[start:end], total
+    return slice(start, start + page_size)
+
+def paginate(df, page, page_size):
+    return df.iloc[page_rows(page, page_size)], len(df)
 
 @dashboard_bp.route("/get_sheets_data/<file>/<sheet>", methods=["GET"])
 def get_sheets_data(file, sheet):
@@ -59,40 +74,44 @@ def get_sheets_data(file, sheet):
         page = int(request.args.get("page", 1))
         page_size = int(request.args.get("page_size", 50))
         search_term = request.args.get("search", "").lower()
+        # "columns" sends typed value arrays instead of one stringified dict per row
+        layout = request.args.get("layout", "records")
 
-        xl = pd.ExcelFile(filepath)
-        df = xl.parse(sheet)
-        xl.close()
-
-        # Replace NaN / NaT with empty string and convert everything to string
-        df = df.fillna("").applymap(lambda x: str(x))
+        # Read-only below, so the cached frame is used without a copy
+        df = read_sheet(filepath, sheet, copy=False)
+        columns = df.columns.tolist()
 
-        # Apply search if provided
+        # Apply search if provided: matching row ids come from the cached index
         if search_term:
-            mask = df.apply(lambda row: row.str.lower().str.contains(search_term).any(), axis=1)
-            df = df[mask]
-
-        # Pagination
-        paged_df, total_rows = paginate(df, page, page_size)
-        preview = paged_df.to_dict(orient="records")
-        columns = df.columns.tolist()
+            index = get_search_index(filepath, sheet, "sheet", lambda: df)
+            row_ids = index.search(search_term)
+            total_rows = len(row_ids)
+            rows = row_ids[page_rows(page, page_size)]
+        else:
+            total_rows = len(df)
+            rows = page_rows(page, page_size)
 
-        return jsonify({
-            "columns": columns,
-            "preview": preview,
+        paging = {
             "total_rows": total_rows,
             "page": page,
             "page_size": page_size,
             "total_pages": (total_rows + page_size - 1) // page_size
-        })
+        }
+
+        if layout == "columns":
+            return json_response({**columnar(df.iloc[rows]), **paging})
+
+        # Replace NaN / NaT with empty string and convert only the page to string;
+        # object first, so date columns take "" for NaT as well
+        paged_df = df.iloc[rows].astype(object).fillna("").astype(str)
+        preview = paged_df.to_dict(orient="records")
+
+        return json_response({"columns": columns, "preview": preview, **paging})
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-MISSING_LABEL = "Missing"
-MISSING_LIST = ["unknown", "nknown", "invalid json", "null", "none", "empty", "missing"]
-
 @dashboard_bp.route("/get_all_columns/<file>/<sheet>", methods=["GET"])
 def get_all_columns(file, sheet):
     filepath = os.path.join(UPLOAD_FOLDER, file)
@@ -100,60 +119,12 @@ def get_all_columns(file, sheet):
         return jsonify({"error": "File not found"}), 404
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-        return jsonify({"columns": df.columns.tolist()})
+        # Manifest lookup; the profile is only built when a view needs its stats
+        return jsonify({"columns": list(get_sheet_columns(filepath, sheet))})
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-def extract_json(value):
-    # True NaN
-    if pd.isna(value):
-        return MISSING_LABEL
-
-    # Empty containers / strings
-    if value in ["", [], {}, "[]"]:
-        return MISSING_LABEL
-
-    # String-specific checks
-    if isinstance(value, str):
-        v = value.strip().lower()
-
-        # Catch common missing/invalid indicators
-        if v in MISSING_LIST:
-            return MISSING_LABEL
-
-        # Try parsing JSON
-        if v.startswith("[{"):
-            try:
-                data = json.loads(value)
-                if isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
-                    # Check for multiple possible keys
-                    for key in ["carrier_name", "name"]:
-                        if key in data[0]:
-                            return data[0][key] if data[0][key] else MISSING_LABEL
-                return MISSING_LABEL
-            except Exception:
-                return MISSING_LABEL
-
-    # Otherwise return the value as-is
-    return value
-
-def parse_datetime(value):
-    if pd.isna(value):
-        return None
-    try:
-        # Replace Persian/Arabic numerals with Latin digits
-        value = value.translate(str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789"))
-        # Try ISO parsing first
-        return datetime.fromisoformat(value)
-    except:
-        try:
-            # Fallback to generic parsing
-            return pd.to_datetime(value, errors='coerce')
-        except:
-            return None
-
 @dashboard_bp.route("/get_column_frequency/<file>/<sheet>/<column>", methods=["GET"])
 def get_column_frequency(file, sheet, column):
     file_path = os.path.join(UPLOAD_FOLDER, file)
@@ -162,26 +133,17 @@ def get_column_frequency(file, sheet, column):
         return {"error": "File not found"}
 
     try:
-        df = pd.read_excel(file_path, sheet_name=sheet)
-
-        if column not in df.columns:
+        profile = get_sheet_profile(file_path, sheet)
+        if column not in profile["columns"]:
             return {"error": f"Column '{column}' not found in the sheet."}
 
-        # Normalize values
-        df[column] = df[column].apply(extract_json)
-        df[column] = df[column].astype(str).str.strip().str.title()  # trims and standardizes
-
-        # Check for datetime column
-        df['parsed_dates'] = df[column].apply(parse_datetime)
-        if df['parsed_dates'].notna().any():
-            # Group by month
-            df['month'] = df['parsed_dates'].dt.to_period('M')
-            frequency_series = df['month'].value_counts().sort_index()
-            frequency = {str(k): int(v) for k, v in frequency_series.items()}
-        else:
-            # Normal categorical / string column
-            frequency_series = df[column].value_counts(dropna=False)
-            frequency = frequency_series.to_dict()
+        # Precomputed at upload unless the column has too many distinct values
+        frequency = profile["columns"][column]["frequency"]
+        if frequency is None:
+            frequency = cached_column_frequency(
+                file_path, sheet, column,
+                lambda: read_sheet(file_path, sheet, columns=[column])[column]
+            )
 
         # Ensure numeric values for frontend highest/lowest
         numeric_freq = {}
@@ -191,7 +153,6 @@ def get_column_frequency(file, sheet, column):
             else:
                 numeric_freq[k] = int(v) if str(v).isdigit() else 0
 
-        print(numeric_freq)
         return {"frequency": numeric_freq}
 
     except Exception as e:
@@ -199,60 +160,65 @@ def get_column_frequency(file, sheet, column):
         return {"error": str(e)}
     
 @dashboard_bp.route("/get_correlation_heatmap/<file>/<sheet>", methods=["GET"])
+@async_capable
 def get_correlation_heatmap(file, sheet):
     filepath = os.path.join(UPLOAD_FOLDER, file)
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found"}), 404
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-
-        for date_col in ['active_date', 'last_boot_date', 'interval_date']:
-            if date_col in df.columns:
-                df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
+        # Optional: restrict wide sheets to the N most correlated columns
+        top_n = request.args.get("top", type=int)
 
-        if 'last_boot_date' in df.columns and 'active_date' in df.columns:
-            df['last boot - active'] = (df['last_boot_date'] - df['active_date']).dt.total_seconds() / (3600*24)
-        if 'last_boot_date' in df.columns and 'interval_date' in df.columns:
-            df['last boot - interval'] = (df['last_boot_date'] - df['interval_date']).dt.total_seconds() / (3600*24)
+        # Correlation comes from chunked sums; the figure JSON is cached already serialized
+        fig_json = get_heatmap_json(filepath, sheet, top_n)
+        if not fig_json:
+            return jsonify({"message": "No numeric columns to calculate correlation"}), 200
 
-        # Keep only numeric columns for correlation
-        numeric_df = df.select_dtypes(include=["number"])
+        return Response('{"plotly_json": ' + fig_json + '}', status=200, mimetype="application/json")
 
-        if numeric_df.empty:
-            return jsonify({"message": "No numeric columns to calculate correlation"}), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-        # Compute correlation matrix
-        corr_df = numeric_df.corr().round(3)
-
-        # Create Plotly heatmap
-        fig = go.Figure(
-            data=go.Heatmap(
-                z=corr_df.values,
-                x=corr_df.columns,
-                y=corr_df.columns,
-                colorscale='RdBu',
-                zmin=-1,
-                zmax=1,
-                colorbar=dict(title="Correlation")
+def distribution_figure(column, breakdown):
+    # Numeric column -> boxplot drawn from precomputed statistics
+    if breakdown["type"] == "box":
+        fig = go.Figure()
+        for val, stats in breakdown["groups"].items():
+            if stats is None:
+                continue
+            fig.add_trace(
+                go.Box(
+                    x=[f"{column} (Churn={val})"],
+                    q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+                    lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]],
+                    mean=[stats["mean"]], sd=[stats["sd"]],
+                    name=f"{column} (Churn={val})",
+                    boxmean='sd'
+                )
+            )
+        fig.update_layout(title=f"{column} vs Churn", yaxis_title=column, xaxis_title="Churn")
+
+    # Categorical column -> stacked bar
+    else:
+        fig = go.Figure()
+        for churn_val, counts in breakdown["groups"].items():
+            fig.add_trace(
+                go.Bar(
+                    x=breakdown["categories"],
+                    y=counts,
+                    name=f"Churn={churn_val}"
+                )
             )
-        )
-
         fig.update_layout(
-            xaxis_title="Columns",
-            yaxis_title="Columns",
-            autosize=True,
-            margin=dict(l=100, r=100, t=100, b=100)
+            barmode='stack',
+            title=f"{column} vs Churn",
+            xaxis_title=column,
+            yaxis_title="Count"
         )
 
-        # Convert figure to JSON
-        fig_json = fig.to_json()
-
-        return jsonify({"plotly_json": json.loads(fig_json)}), 200
-
-    except Exception as e:
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+    return fig
 
 @dashboard_bp.route("/get_distribution_vs_churn/<file>/<sheet>/<column>", methods=["GET"])
 def get_distribution_vs_churn(file, sheet, column):
@@ -261,63 +227,110 @@ def get_distribution_vs_churn(file, sheet, column):
         return jsonify({"error": "File not found"}), 404
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
+        profile = get_sheet_profile(filepath, sheet)
 
         # Detect churn column
-        churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
-        target = next((c for c in churn_cols if c in df.columns), None)
+        target = profile["churn_column"]
         if target is None:
             return jsonify({"message": "No churn column found"}), 200
 
-        # Convert churn to numeric
-        df[target] = pd.to_numeric(df[target], errors="coerce").fillna(0).astype(int)
-
-        if column not in df.columns:
+        if column not in profile["columns"]:
             return jsonify({"error": f"Column '{column}' not found"}), 404
 
-        # Numeric column -> boxplot
-        if pd.api.types.is_numeric_dtype(df[column]):
-            fig = go.Figure()
-            for val in sorted(df[target].unique()):
-                fig.add_trace(
-                    go.Box(
-                        y=df[df[target] == val][column],
-                        name=f"{column} (Churn={val})",
-                        boxmean='sd'
-                    )
-                )
-            fig.update_layout(title=f"{column} vs Churn", yaxis_title=column, xaxis_title="Churn")
+        # Figure JSON is built once per column from the profile's grouped statistics
+        breakdown = profile["columns"][column]["by_churn"]
+        def build():
+            with stage("plotly"):
+                return distribution_figure(column, breakdown).to_json()
 
-        # Categorical column -> stacked bar
-        else:
-            counts = df.groupby([column, target]).size().unstack(fill_value=0)
-            fig = go.Figure()
-            for churn_val in counts.columns:
-                fig.add_trace(
-                    go.Bar(
-                        x=counts.index.astype(str),
-                        y=counts[churn_val],
-                        name=f"Churn={churn_val}"
-                    )
-                )
-            fig.update_layout(
-                barmode='stack',
-                title=f"{column} vs Churn",
-                xaxis_title=column,
-                yaxis_title="Count"
-            )
+        fig_json = get_distribution_json(filepath, sheet, column, build)
 
-        return jsonify({"column": column, "plotly_json": json.loads(fig.to_json())}), 200
+        return Response('{"column": ' + json.dumps(column) + ', "plotly_json": ' + fig_json + '}',
+                        status=200, mimetype="application/json")
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-OLLAMA_URL = "http://localhost:11434/api/chat"
-OLLAMA_MODEL = "llama3.2"
+LLM_OPTIONS = {
+    "temperature": 0.1,
+    "num_ctx": 4096
+}
+
+def build_messages(filepath, sheet, question):
+    # ---------- Retrieve the relevant context ----------
+    # Column profiles and row chunks closest to the question, not the whole sheet
+    index = get_retrieval_index(filepath, sheet)
+    with stage("retrieval", rows=len(index)):
+        context, sources = index.context(question)
+
+    # ---------- Prompt ----------
+    prompt = f"""
+    Dataset context:
+    {context}
+
+    User question:
+    {question}
+
+    Answer ONLY using the dataset information above.
+    If the question cannot be answered, say so.
+    Keep the answer concise.
+    """
+
+    messages = [
+        {"role": "system", "content": "You are a data analyst. Answer only from provided dataset context."},
+        {"role": "user", "content": prompt}
+    ]
+    return messages, sources
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_answer(key, cached, messages, sources):
+    # Server-sent events: sources, then token events as generated, then done (or error)
+    if cached is not None:
+        def generate():
+            yield sse("sources", cached["sources"])
+            yield sse("token", {"token": cached["answer"]})
+            yield sse("done", {"cached": True})
+        events = generate()
+    else:
+        def generate():
+            # Timed until the last token, like the JSON path
+            with stage("llm"):
+                pieces = llm_client.stream_chat(messages, LLM_OPTIONS)
+                parts = [next(pieces, "")]
+                try:
+                    yield None
+                    yield sse("sources", sources)
+                    if parts[0]:
+                        yield sse("token", {"token": parts[0]})
+                    for piece in pieces:
+                        parts.append(piece)
+                        yield sse("token", {"token": piece})
+                except LLMError as e:
+                    yield sse("error", {"error": str(e)})
+                    return
+                finally:
+                    # Frees the concurrency slot at once if the browser went away mid-answer
+                    pieces.close()
+            answer_cache.put(key, {"answer": "".join(parts), "sources": sources})
+            yield sse("done", {"cached": False})
+
+        events = generate()
+        # Runs up to the first token here, so "busy" can still be a 503
+        next(events)
+
+    response = Response(stream_with_context(events), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Ends the stage and frees the slot even if the response is closed before it is read
+    response.call_on_close(events.close)
+    return response
 
 @dashboard_bp.route("/ask_ai_about_sheet/<file>/<sheet>", methods=["POST"])
+@async_capable
 def ask_ai_about_sheet(file, sheet):
+    # ?stream=1 answers as server-sent events instead of one JSON body
     filepath = os.path.join(UPLOAD_FOLDER, file)
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found"}), 404
@@ -327,84 +340,27 @@ def ask_ai_about_sheet(file, sheet):
         if not question:
             return jsonify({"answer": "Please ask a question."})
 
-        df = pd.read_excel(filepath, sheet_name=sheet)
-
-        # ---------- Build compact dataset summary ----------
-        schema = "\n".join([f"- {c}: {df[c].dtype}" for c in df.columns])
-        row_count = len(df)
-
-        summary_lines = []
-        summary_lines.append(f"Total rows: {row_count}")
-
-        # Missing values
-        missing = df.isna().sum()
-        summary_lines.append("\nMissing values per column:")
-        summary_lines.append(missing.to_string())
-
-        # Numeric stats
-        numeric_df = df.select_dtypes(include=["number"])
-        if not numeric_df.empty:
-            summary_lines.append("\nNumeric statistics:")
-            summary_lines.append(numeric_df.describe().round(2).to_string())
-
-        # Categorical top values (limit)
-        cat_df = df.select_dtypes(exclude=["number"])
-        for col in cat_df.columns[:5]:
-            top_vals = cat_df[col].value_counts().head(3)
-            summary_lines.append(f"\nTop values for {col}:")
-            summary_lines.append(top_vals.to_string())
-
-        # Sample rows
-        summary_lines.append("\nSample rows:")
-        summary_lines.append(df.head(5).to_csv(index=False))
-
-        data_section = "\n".join(summary_lines)
-
-        # ---------- Prompt ----------
-        prompt = f"""
-        Dataset columns:
-        {schema}
-
-        Dataset summary:
-        {data_section}
-
-        User question:
-        {question}
-
-        Answer ONLY using the dataset information above.
-        If the question cannot be answered, say so.
-        Keep the answer concise.
-        """
-
-        payload = {
-            "model": OLLAMA_MODEL,
-            "messages": [
-                {"role": "system", "content": "You are a data analyst. Answer only from provided dataset summary."},
-                {"role": "user", "content": prompt}
-            ],
-            "options": {
-                "temperature": 0.1,
-                "num_ctx": 4096
-            },
-            "stream": False
-        }
-
-        response = requests.post(OLLAMA_URL, json=payload, timeout=120)
-        result = response.json()
-
-        # Ollama response handling
-        if "message" in result:
-            answer = result["message"]["content"]
-        elif "response" in result:
-            answer = result["response"]
-        elif "error" in result:
-            return jsonify({"error": result["error"]}), 500
-        else:
-            return jsonify({"error": f"Unexpected Ollama response: {result}"}), 500
-
-        return jsonify({"answer": answer})
-
+        # Same sheet content + same question + same model = same answer
+        key = answer_key(content_index.digest(UPLOAD_FOLDER, file), sheet, question, llm_client.model)
+        cached = answer_cache.get(key)
+        messages, sources = build_messages(filepath, sheet, question) if cached is None else (None, None)
+
+        if request.args.get(STREAM_FLAG, "").lower() in TRUE_VALUES:
+            return stream_answer(key, cached, messages, sources)
+
+        if cached is not None:
+            return jsonify({**cached, "cached": True})
+        with stage("llm"):
+            answer = llm_client.chat(messages, LLM_OPTIONS)
+        entry = {"answer": answer, "sources": sources}
+        answer_cache.put(key, entry)
+        return jsonify({**entry, "cached": False})
+
+    except LLMBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+    except LLMError as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 502
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
-
@@ -0,0 +1,59 @@
+from urllib.parse import urlsplit, parse_qsl
+from flask import Blueprint, request, jsonify, Response, current_app
+from werkzeug.exceptions import HTTPException
+from services.job_queue import job_queue, submit_view
+
+jobs_bp = Blueprint("jobs", __name__)
+
+@jobs_bp.route("/jobs", methods=["POST"])
+def submit_job():
+    # {"url": "/model_accuracy/<file>/<sheet>", "method": "GET", "json": {...}}
+    body = request.json or {}
+    url = body.get("url", "")
+    method = body.get("method", "GET").upper()
+    parts = urlsplit(url)
+
+    try:
+        endpoint, view_args = current_app.url_map.bind("").match(parts.path, method=method)
+    except HTTPException:
+        return jsonify({"error": f"No route for {method} {parts.path}"}), 404
+
+    view = current_app.view_functions[endpoint]
+    if not getattr(view, "async_capable", False):
+        return jsonify({"error": f"{parts.path} cannot run as a background job"}), 400
+
+    job = submit_view(view.__wrapped__, view_args, parts.path, method,
+                      dict(parse_qsl(parts.query)), body.get("json"))
+    return jsonify(job.to_dict()), 202
+
+@jobs_bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": job_queue.list()}), 200
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
+@jobs_bp.route("/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == "failed":
+        return jsonify({"error": job.error}), 500
+    if job.status != "finished":
+        return jsonify(job.to_dict()), 202
+
+    # Replay the response the route produced
+    status, headers, data = job.result
+    return Response(data, status=status, headers=headers)
+
+@jobs_bp.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
@@ -0,0 +1,45 @@
+import os
+import traceback
+from flask import Blueprint, jsonify, Response
+from services.instrumentation import metrics, PROFILES_FOLDER
+from services.startup import startup_report
+from services.warmup import run_warmup, warmup_state
+from controllers.upload_controller import UPLOAD_FOLDER
+
+metrics_bp = Blueprint("metrics", __name__)
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    # Prometheus text exposition format
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@metrics_bp.route("/profiles", methods=["GET"])
+def list_profiles():
+    if not os.path.isdir(PROFILES_FOLDER):
+        return jsonify({"profiles": []})
+    names = sorted(os.listdir(PROFILES_FOLDER),
+                   key=lambda n: os.path.getmtime(os.path.join(PROFILES_FOLDER, n)), reverse=True)
+    return jsonify({"profiles": [os.path.splitext(n)[0] for n in names]})
+
+@metrics_bp.route("/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    # Folded stacks: pipe into flamegraph.pl or open in speedscope
+    path = os.path.join(PROFILES_FOLDER, f"{os.path.basename(profile_id)}.folded")
+    if not os.path.exists(path):
+        return jsonify({"error": "Profile not found"}), 404
+    with open(path, "r") as f:
+        return Response(f.read(), mimetype="text/plain")
+
+@metrics_bp.route("/startup", methods=["GET"])
+def get_startup():
+    # Import/startup timings and warm-up progress, e.g. for a readiness probe
+    return jsonify({**startup_report(), "warmup": warmup_state()})
+
+@metrics_bp.route("/warmup", methods=["POST"])
+def warmup():
+    # Explicit warm-up hook: load models and deferred modules before real traffic
+    try:
+        return jsonify(run_warmup(UPLOAD_FOLDER)), 200
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
@@ -1,72 +1,101 @@
 import os
 import json
-from flask import Blueprint, request, jsonify, send_file, Response
+import re
+import uuid
+import itertools
+from flask import Blueprint, request, jsonify, Response
 import tempfile
-import joblib
-import pandas as pd
 import traceback
-from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
+from services.job_queue import async_capable
+from services.sheet_cache import read_sheet, get_sheet_names, get_sheet_columns
+from services.columnar_store import iter_sheet_batches, estimate_row_bytes
+from services.prediction_cache import ScoredSheet, get_scored
+from services.model_registry import get_model, model_registry, ModelNotFound, ModelLoadError, DEFAULT_VERSION
+from services.search_index import get_search_index
+from services.evaluation import evaluate, get_evaluation
+from services.inference import THRESHOLD
+from services.features import FEATURE_COLUMNS, derive_features, model_features, get_aligned_features
+from services.batch_jobs import batch_runner
+from services.json_response import json_response, columnar
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+openpyxl = lazy_import("openpyxl")
 
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 predictions_bp = Blueprint("predictions", __name__)
 
-# Load model and preprocessor
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # folder where this file is
-MODEL_PATH = os.path.join(BASE_DIR, "..", "models", "churn_model_xgb.joblib")
-PREPROCESSOR_PATH = os.path.join(BASE_DIR, "..", "models", "preprocessor.joblib")
+def request_model():
+    # Model + scaler pair for this request: ?model=<version>, default otherwise
+    return get_model(request.args.get("model"))
 
-xgb_model = joblib.load(MODEL_PATH)
-preprocessor = joblib.load(PREPROCESSOR_PATH)
+@predictions_bp.errorhandler(ModelNotFound)
+def model_not_found(e):
+    return jsonify({"error": f"Model version {e} not found"}), 404
+
+@predictions_bp.errorhandler(ModelLoadError)
+def model_load_error(e):
+    # Raised by request_model() outside the routes' try blocks
+    traceback.print_exc()
+    return jsonify({"error": str(e)}), 500
 
 target = 'Churn'
+CHURN_COLUMNS = ['Chrn Flag', 'Churn', 'Churn Flag']
 
 def preprocess_sheet(df):
-    df = df.copy()
-
-    churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
-    for col in churn_cols:
-        if col in df.columns:
-            df[target] = df[col]
-            break
-    for col in churn_cols:
-        if col in df.columns and col != target:
-            df.drop(columns=col, inplace=True)
-
-    for date_col in ['active_date', 'last_boot_date', 'interval_date']:
-        if date_col in df.columns:
-            df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-
-    df['last boot - active'] = ((df['last_boot_date'] - df['active_date']).dt.total_seconds() / (3600*24)
-                                if 'last_boot_date' in df.columns and 'active_date' in df.columns else 0)
-    df['last boot - interval'] = ((df['last_boot_date'] - df['interval_date']).dt.total_seconds() / (3600*24)
-                                  if 'interval_date' in df.columns and 'last_boot_date' in df.columns else 0)
-
-    df['last boot - active'] = df['last boot - active'].fillna(0)
-    df['last boot - interval'] = df['last boot - interval'].fillna(0)
-
-    # Ensure the relevant columns are in the dataframe
-    relevant_columns = ['last boot - active', 'last boot - interval']
-    missing_columns = [col for col in relevant_columns if col not in df.columns]
-    if missing_columns:
-        print(f"Warning: Missing columns: {', '.join(missing_columns)}")
-        raise KeyError(f"Required columns missing: {', '.join(missing_columns)}")
-
-    # Keep only the relevant columns (exclude 'Churn' from features for prediction)
-    df = df[relevant_columns]
-
-    if target in df.columns:
-        df[target] = df[target].fillna(0)
-
-    return df
-
-def predict_df(df, df_orig):
-    # Transform and predict using core_features
-    X_transformed = preprocessor.transform(df)
+    # Model input for the rows of df; whole sheets come from the feature store instead
+    return model_features(derive_features(df))
+
+# Peak working memory of one scoring batch (override with SCORING_MEMORY_MB)
+SCORING_MEMORY_MB = int(os.environ.get("SCORING_MEMORY_MB", 256))
+SCORING_MAX_BATCH_ROWS = int(os.environ.get("SCORING_MAX_BATCH_ROWS", 100000))
+SCORING_MIN_BATCH_ROWS = 1000
+# Raw column bytes are multiplied by pandas objects, date parsing and the feature copies
+BATCH_MEMORY_FACTOR = 8
+
+def scoring_batch_rows(filepath, sheet, columns=None, max_rows=SCORING_MAX_BATCH_ROWS):
+    row_bytes = estimate_row_bytes(filepath, sheet, columns)
+    if row_bytes is None:
+        return max_rows
+    budget_rows = SCORING_MEMORY_MB * 1024 * 1024 // (row_bytes * BATCH_MEMORY_FACTOR)
+    return int(min(max_rows, max(SCORING_MIN_BATCH_ROWS, budget_rows)))
+
+def iter_scored_batches(bundle, filepath, sheet, columns=None, max_rows=SCORING_MAX_BATCH_ROWS):
+    """Read and predict the sheet one row batch at a time.
+
+    Yields (batch, ScoredSheet) pairs; batch holds the requested columns
+    (all of them by default) for the rows that were scored. Features come
+    from the sheet's feature store, sliced to each batch's rows.
+    """
+    features = model_features(get_aligned_features(filepath, sheet))
+    batch_rows = scoring_batch_rows(filepath, sheet, columns, max_rows)
+    offset = 0
+    for batch in iter_sheet_batches(filepath, sheet, columns=columns, batch_rows=batch_rows):
+        rows = features.iloc[offset:offset + len(batch)]
+        offset += len(batch)
+        with stage("inference", rows=len(batch)):
+            y_proba, y_label = bundle.engine.predict(rows)
+        yield batch, ScoredSheet(y_proba, y_label)
+
+def score_sheet(bundle, filepath, sheet):
+    # Probabilities/labels for every row, computed once per (file, sheet, model version)
+    def scorer():
+        # Only the two feature columns are needed, so the whole sheet is one predict call
+        features = model_features(get_aligned_features(filepath, sheet))
+        with stage("inference", rows=len(features)):
+            return ScoredSheet(*bundle.engine.predict(features))
+
+    return get_scored(filepath, sheet, bundle.version, scorer)
+
+def predict_df(df_orig, scored, rows=None, stringify=True):
+    # Original sheet (or the selected rows of it) plus the prediction columns
+    y_proba, y_label = scored.proba, scored.label
+    if rows is not None:
+        df_orig = df_orig.iloc[rows]
+        y_proba, y_label = y_proba[rows], y_label[rows]
 
-    y_proba = xgb_model.predict_proba(X_transformed)[:, 1]
-    y_label = (y_proba >= 0.5).astype(int)
-
-    # Copy original sheet as-is
     response = df_orig.copy()
 
     # Add prediction columns
@@ -74,15 +103,17 @@ def predict_df(df, df_orig):
     response["Churn Prediction"] = y_label
 
     # Replace all NaN/NaT with empty string
-    response = response.fillna("").astype(str)
+    if stringify:
+        response = response.astype(object).fillna("").astype(str)
 
     return response
 
-def paginate(df, page, page_size):
-    total = len(df)
+def page_rows(page, page_size):
     start = (page - 1) * page_size
-    end = start + page_size
-    return df.iloc[start:end], total
+    return slice(start, start + page_size)
+
+def paginate(df, page, page_size):
+    return df.iloc[page_rows(page, page_size)], len(df)
 
 @predictions_bp.route("/predict_churn/<file>/<sheet>", methods=["GET"])
 def get_predictions(file, sheet):
@@ -94,54 +125,108 @@ def get_predictions(file, sheet):
     page = int(request.args.get("page", 1))
     page_size = int(request.args.get("page_size", 20))
     search_term = request.args.get("search", "").lower()
+    # "columns" sends typed value arrays instead of one stringified dict per row
+    layout = request.args.get("layout", "records")
+    bundle = request_model()
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-        df_orig = df.copy()
-        df = preprocess_sheet(df)
-        response_df = predict_df(df, df_orig)
+        scored = score_sheet(bundle, filepath, sheet)
+        # predict_df copies the rows it uses, so the cached frame is not copied here
+        df_orig = read_sheet(filepath, sheet, copy=False)
 
         if search_term:
-            mask = response_df.apply(lambda row: row.astype(str).str.contains(search_term, case=False).any(), axis=1)
-            response_df = response_df[mask]
+            # The index covers the prediction columns too, so it is tied to the model version
+            index = get_search_index(filepath, sheet, ("predictions", bundle.version),
+                                     lambda: predict_df(df_orig, scored))
+            row_ids = index.search(search_term)
+            total = len(row_ids)
+            rows = row_ids[page_rows(page, page_size)]
+        else:
+            total = len(scored)
+            rows = page_rows(page, page_size)
 
-        paged_df, total = paginate(response_df, page, page_size)
         total_pages = (total + page_size - 1) // page_size
 
-        return jsonify({
+        # Only the requested page needs to be built and serialized
+        if layout == "columns":
+            paged_df = predict_df(df_orig, scored, rows=rows, stringify=False)
+            return json_response({**columnar(paged_df), "total_rows": total, "total_pages": total_pages})
+
+        paged_df = predict_df(df_orig, scored, rows=rows)
+        return json_response({
             "preview": paged_df.to_dict(orient="records"),
-            "columns": list(response_df.columns),
+            "columns": list(paged_df.columns),
             "total_pages": total_pages
-        }), 200
+        })
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+# Rows stringified and written per step of a download (override with EXPORT_CHUNK_ROWS)
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 10000))
+EXPORT_READ_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    "xlsx": ("predictions.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("predictions.csv", "text/csv")
+}
+
+def iter_prediction_chunks(bundle, filepath, sheet, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Scored batch by batch, so memory stays flat however long the sheet is
+    for batch, scored in iter_scored_batches(bundle, filepath, sheet, max_rows=chunk_rows):
+        yield predict_df(batch, scored)
+
+def stream_csv(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+def stream_xlsx(chunks):
+    # Write-only workbooks keep rows on disk instead of building them in memory
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    header = True
+    for chunk in chunks:
+        if header:
+            ws.append(list(chunk.columns))
+            header = False
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append(row)
+
+    # Anonymous temp file: removed on close, even if the client disconnects
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            data = tmp.read(EXPORT_READ_BYTES)
+            if not data:
+                break
+            yield data
+
 @predictions_bp.route("/download_predictions/<file>/<sheet>", methods=["GET"])
+@async_capable
 def download_predictions(file, sheet):
     print("Downloading full predictions...")
     filepath = os.path.join(UPLOAD_FOLDER, file)
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found"}), 404
 
+    export_format = request.args.get("format", "xlsx").lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format '{export_format}'"}), 400
+    bundle = request_model()
+
     try:
-        # Load the Excel file
-        df = pd.read_excel(filepath, sheet_name=sheet)
-        df_orig = df.copy()
-        df = preprocess_sheet(df)  # Preprocess the data
-        response_df = predict_df(df, df_orig)  # Generate predictions
-        
-        # Create a temporary file to store the Excel output
-        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp_file:
-            output_path = tmp_file.name
-            response_df.to_excel(output_path, index=False)
-            tmp_file.close()  # Close the file explicitly
-
-        # Send the generated file to the client
-        return send_file(output_path, 
-                         as_attachment=True, 
-                         download_name="predictions.xlsx", 
-                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        # Resolve the sheet and its first chunk up front so failures still come back as JSON
+        chunks = iter_prediction_chunks(bundle, filepath, sheet)
+        chunks = itertools.chain([next(chunks)], chunks)
+
+        body = stream_csv(chunks) if export_format == "csv" else stream_xlsx(chunks)
+        download_name, mimetype = EXPORT_FORMATS[export_format]
+        return Response(body,
+                        mimetype=mimetype,
+                        headers={"Content-Disposition": f'attachment; filename="{download_name}"'})
     
     except Exception as e:
         traceback.print_exc()
@@ -152,23 +237,21 @@ def predictions_stats(file, sheet):
     filepath = os.path.join(UPLOAD_FOLDER, file)
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found"}), 404
+    bundle = request_model()
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
-        df_orig = df.copy()
-        df = preprocess_sheet(df)
-        response_df = predict_df(df, df_orig)
-
-        # Compute statistics
-        total = len(response_df)
-        churn_count = (response_df["Churn Prediction"] == "1").sum()
+        scored = score_sheet(bundle, filepath, sheet)
+
+        # Compute statistics straight from the cached arrays
+        total = len(scored)
+        churn_count = int(scored.label.sum(dtype=np.int64))
         non_churn_count = total - churn_count
-        avg_prob = response_df["Churn Prediction Probability"].astype(float).mean()
+        avg_prob = scored.proba.mean(dtype=np.float64) if total else float("nan")
 
         stats = {
             "total_rows": total,
-            "churn_count": int(churn_count),
-            "non_churn_count": int(non_churn_count),
+            "churn_count": churn_count,
+            "non_churn_count": non_churn_count,
             "average_probability": float(avg_prob)
         }
 
@@ -178,51 +261,113 @@ def predictions_stats(file, sheet):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+# Scored sheets written by batch jobs, one folder per job
+PREDICTIONS_FOLDER = os.path.join(os.getcwd(), "predictions")
+
+def score_sheet_to_file(filepath, sheet, output_path, model_name=None):
+    # Runs in a batch worker process: streams the scored sheet to CSV on disk
+    bundle = get_model(model_name)
+    rows = 0
+    header = True
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        for chunk in iter_prediction_chunks(bundle, filepath, sheet):
+            chunk.to_csv(f, index=False, header=header)
+            header = False
+            rows += len(chunk)
+    return {"output": output_path, "rows": rows}
+
+def batch_targets(body):
+    # [{"file": ..., "sheet": ...}] or {"all": true}; a target without a sheet means all its sheets
+    if body.get("all"):
+        requested = [{"file": f} for f in sorted(os.listdir(UPLOAD_FOLDER))]
+    else:
+        requested = body.get("targets", [])
+
+    targets, errors = [], {}
+    for item in requested:
+        file = item.get("file", "")
+        filepath = os.path.join(UPLOAD_FOLDER, file)
+        if not file or not os.path.isfile(filepath):
+            errors[file] = "File not found"
+            continue
+        try:
+            sheets = [item["sheet"]] if item.get("sheet") else get_sheet_names(filepath)
+        except Exception as e:
+            errors[file] = str(e)
+            continue
+        targets.extend((file, sheet) for sheet in sheets)
+    return targets, errors
+
+@predictions_bp.route("/batch_predict", methods=["POST"])
+def batch_predict():
+    body = request.json or {}
+    # Resolved here so an unknown version fails before any work is queued
+    bundle = get_model(body.get("model"))
+
+    try:
+        targets, errors = batch_targets(body)
+        if not targets:
+            return jsonify({"error": "No sheets to score", "errors": errors}), 400
+
+        job_id = uuid.uuid4().hex
+        output_dir = os.path.join(PREDICTIONS_FOLDER, job_id)
+        os.makedirs(output_dir, exist_ok=True)
+
+        tasks = []
+        for file, sheet in targets:
+            output_name = re.sub(r"[^\w.-]+", "_", f"{file}__{sheet}") + ".csv"
+            args = (os.path.join(UPLOAD_FOLDER, file), sheet, os.path.join(output_dir, output_name), bundle.name)
+            tasks.append((f"{file}/{sheet}", args))
+
+        job = batch_runner.submit(score_sheet_to_file, tasks, output_dir, job_id)
+        response = batch_runner.get(job.id)
+        response["skipped"] = errors
+        return jsonify(response), 202
+
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@predictions_bp.route("/batch_predict/<job_id>", methods=["GET"])
+def batch_predict_status(job_id):
+    job = batch_runner.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job), 200
+
+@predictions_bp.route("/batch_predict", methods=["GET"])
+def batch_predict_jobs():
+    return jsonify({"jobs": batch_runner.list()}), 200
+
 @predictions_bp.route("/model_accuracy/<file>/<sheet>", methods=["GET"])
+@async_capable
 def model_accuracy(file, sheet):
     filepath = os.path.join(UPLOAD_FOLDER, file)
     if not os.path.exists(filepath):
         return jsonify({"error": "File not found"}), 404
+    bundle = request_model()
 
     try:
-        df = pd.read_excel(filepath, sheet_name=sheet)
+        all_columns = get_sheet_columns(filepath, sheet)
 
         # Find churn column
-        churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
-        churn_col_found = next((col for col in churn_cols if col in df.columns), None)
+        churn_col_found = next((col for col in CHURN_COLUMNS if col in all_columns), None)
         if churn_col_found is None:
             return jsonify({"message": "No churn column found in this sheet"}), 200
 
-        # Convert churn column to numeric safely
-        y_true_raw = pd.to_numeric(df[churn_col_found], errors="coerce")
+        # Labels are the only column read; scores come from the prediction cache
+        def evaluator():
+            labels = read_sheet(filepath, sheet, columns=[churn_col_found], copy=False)[churn_col_found]
+            y_true = pd.to_numeric(labels, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            return evaluate(score_sheet(bundle, filepath, sheet), y_true)
 
-        # Keep only rows with valid numeric churn labels
-        valid_mask = y_true_raw.notna()
-        if valid_mask.sum() == 0:
+        evaluation = get_evaluation(filepath, sheet, bundle.version, evaluator)
+        if evaluation.rows == 0:
             return jsonify({"message": "Churn column exists but contains no valid numeric labels"}), 200
 
-        # Filter valid rows
-        y_true = y_true_raw[valid_mask].astype(int)
-        df_valid = df.loc[valid_mask].copy()
-
-        # Preprocess features
-        df_features = preprocess_sheet(df_valid)
-        X_transformed = preprocessor.transform(df_features)
-
-        # Predict
-        y_pred = xgb_model.predict(X_transformed)
-        y_proba = xgb_model.predict_proba(X_transformed)[:, 1]
-
-        # Compute metrics
-        report_raw = classification_report(
-            y_true, y_pred, labels=[0, 1], output_dict=True, zero_division=0
-        )
-        conf_matrix = confusion_matrix(y_true, y_pred, labels=[0, 1]).tolist()
-        auc_score = roc_auc_score(y_true, y_proba)
-
         # Format classification report numbers as strings with 3 decimals
         report = {}
-        for key, values in report_raw.items():
+        for key, values in evaluation.classification_report().items():
             if isinstance(values, dict):
                 report[key] = {
                     "precision": f"{values['precision']:.3f}",
@@ -233,13 +378,18 @@ def model_accuracy(file, sheet):
             else:
                 report[key] = f"{values:.3f}"  # accuracy
 
-        # Format ROC-AUC as string
-        auc_score_str = f"{auc_score:.3f}"
+        # Format ROC-AUC as string; undefined when only one class is present
+        auc_score = evaluation.roc_auc()
+        auc_score_str = f"{auc_score:.3f}" if auc_score is not None else "N/A"
 
         return jsonify({
             "classification_report": report,
-            "confusion_matrix": conf_matrix,
-            "roc_auc": auc_score_str
+            "confusion_matrix": evaluation.confusion.tolist(),
+            "roc_auc": auc_score_str,
+            "rows": evaluation.rows,
+            "threshold": THRESHOLD,
+            # Precision/recall at every cutoff, so the page can move the threshold locally
+            "threshold_sweep": evaluation.sweep()
         }), 200
 
     except Exception as e:
@@ -248,12 +398,13 @@ def model_accuracy(file, sheet):
 
 @predictions_bp.route("/feature_importance", methods=["GET"])
 def feature_importance():
+    bundle = request_model()
     try:
         # Must match the feature order used during training
-        feature_names = ['last boot - active', 'last boot - interval']
+        feature_names = FEATURE_COLUMNS
 
         # Get raw importance scores from XGBoost model
-        importances = xgb_model.feature_importances_
+        importances = bundle.model.feature_importances_
 
         # Normalize to percentage
         total = importances.sum()
@@ -271,6 +422,14 @@ def feature_importance():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@predictions_bp.route("/models", methods=["GET"])
+def list_models():
+    return jsonify({
+        "default": DEFAULT_VERSION,
+        "available": model_registry.available(),
+        "loaded": model_registry.loaded()
+    }), 200
+
 @predictions_bp.route("/model_training_metrics", methods=["GET"])
 def model_training_metrics():
     try:
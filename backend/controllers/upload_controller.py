@@ -1,5 +1,13 @@
 import os
+import json
 from flask import Blueprint, request, jsonify
+from services.sheet_cache import get_sheet_names
+from services.columnar_store import ensure_converted
+from services.sheet_profile import profile_workbook
+from services.features import featurize_workbook
+from services.retrieval_index import index_workbook
+from services.upload_store import upload_manager, receive_file, safe_filename, UploadError
+from services.job_queue import job_queue
 
 upload_bp = Blueprint("upload", __name__)
 
@@ -7,6 +15,29 @@ upload_bp = Blueprint("upload", __name__)
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+@upload_bp.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify({"error": str(e), **e.details}), e.status
+
+def ingest(filepath):
+    # Convert every sheet to Parquet once so later reads skip the Excel parse
+    ensure_converted(filepath)
+    # Column profiles answer the dashboard and AI summary without re-reading
+    profile_workbook(filepath)
+    # Model features are derived once and shared by scoring, accuracy and the heatmap
+    featurize_workbook(filepath)
+    # Embedded column profiles and row chunks for ask_ai_about_sheet
+    index_workbook(filepath)
+
+def submit_ingest(filepath, filename):
+    # Background job; its result replays as {"file", "sheets"} from /jobs/<id>/result
+    def run():
+        ingest(filepath)
+        body = json.dumps({"file": filename, "sheets": get_sheet_names(filepath)})
+        return 200, {"Content-Type": "application/json"}, body.encode("utf-8")
+
+    return job_queue.submit(f"ingest {filename}", run)
+
 @upload_bp.route("/upload", methods=["POST"])
 def upload_files():
     if "files" not in request.files:
@@ -14,12 +45,64 @@ def upload_files():
 
     files = request.files.getlist("files")
     saved_files = []
+    # Ingest job per stored name (None when the content was already processed);
+    # poll /jobs/<job_id> to know when a file's sheets are ready
+    jobs = {}
 
     for f in files:
-        # Save each file
-        filepath = os.path.join(UPLOAD_FOLDER, f.filename)
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        f.save(filepath)
-        saved_files.append(f.filename)
+        name = safe_filename(f.filename)
+        # Streamed to disk and hashed; a file with identical content keeps its processed data
+        _, deduplicated, _ = receive_file(f.stream, UPLOAD_FOLDER, name)
+        jobs[name] = None if deduplicated else submit_ingest(os.path.join(UPLOAD_FOLDER, name), name).to_dict()
+        saved_files.append(name)
+
+    return jsonify({"message": "Files uploaded successfully", "files": saved_files, "jobs": jobs}), 200
+
+# Resumable uploads: POST /uploads {filename, size}, then PUT /uploads/<id>?offset=N
+# with raw chunk bytes until every byte has arrived. GET /uploads/<id> tells a
+# client where to resume after an interruption.
+
+@upload_bp.route("/uploads", methods=["POST"])
+def start_upload():
+    body = request.json or {}
+    upload = upload_manager.create(body.get("filename"), body.get("size"))
+    if upload.complete:
+        # Empty file: nothing to wait for
+        return jsonify(finish_upload(upload)), 201
+    return jsonify(upload.to_dict()), 201
+
+@upload_bp.route("/uploads/<upload_id>", methods=["GET"])
+def upload_status(upload_id):
+    return jsonify(upload_manager.get(upload_id).to_dict()), 200
+
+@upload_bp.route("/uploads/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id):
+    offset = request.args.get("offset", type=int)
+    if offset is None:
+        return jsonify({"error": "offset query parameter is required"}), 400
+
+    upload = upload_manager.write_chunk(upload_id, offset, request.stream)
+    if upload.complete:
+        return jsonify(finish_upload(upload)), 200
+    return jsonify(upload.to_dict()), 200
+
+@upload_bp.route("/uploads/<upload_id>", methods=["DELETE"])
+def abort_upload(upload_id):
+    upload_manager.get(upload_id)
+    upload_manager.discard(upload_id)
+    return jsonify({"message": "Upload cancelled"}), 200
 
-    return jsonify({"message": "Files uploaded successfully", "files": saved_files}), 200
+def finish_upload(upload):
+    digest, deduplicated, source = upload_manager.finish(upload, UPLOAD_FOLDER)
+    result = {
+        **upload.to_dict(),
+        "file": upload.filename,
+        "sha256": digest,
+        "deduplicated": deduplicated,
+        "reused_from": source,
+        "job": None
+    }
+    if not deduplicated:
+        # Conversion and profiling start as soon as the last chunk lands
+        result["job"] = submit_ingest(os.path.join(UPLOAD_FOLDER, upload.filename), upload.filename).to_dict()
+    return result
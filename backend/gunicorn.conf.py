@@ -0,0 +1,46 @@
+# gunicorn -c backend/gunicorn.conf.py   (run from the repository root, like app.py)
+import os
+import gc
+
+# Worker processes and threads per worker (override with WEB_WORKERS / WEB_THREADS).
+# Background jobs (?async=1, /batch_predict, upload ingest) keep their state in
+# the process that started them, so polling only works with a single worker;
+# concurrency comes from threads (pandas, NumPy and XGBoost release the GIL)
+workers = int(os.environ.get("WEB_WORKERS", 1))
+threads = int(os.environ.get("WEB_THREADS", 8))
+worker_class = "gthread"
+bind = os.environ.get("BIND", "0.0.0.0:5001")
+# Scoring and exports of large sheets can take minutes
+timeout = int(os.environ.get("WEB_TIMEOUT", 300))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app (and the model) once in the master, then fork
+preload_app = True
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "wsgi:application"
+
+# wsgi.py warms up in the master in a fork-safe way; app.py's own hook stays off
+os.environ["WARMUP"] = "0"
+
+# Split the cores between workers so concurrent predictions don't oversubscribe them
+os.environ.setdefault("INFERENCE_NTHREAD", str(max(1, (os.cpu_count() or 1) // workers)))
+
+accesslog = "-"
+
+
+def when_ready(server):
+    if workers > 1:
+        server.log.warning(f"WEB_WORKERS={workers}: job status polls (/jobs/<id>, /batch_predict/<id>) "
+                           "only find jobs started by the same worker and may return 404")
+    # Objects loaded so far are moved out of the collector's reach, so GC passes
+    # in the workers don't touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Runs in each worker before it accepts connections. Predictions are only made
+    # after the fork: OpenMP thread pools started in the master don't survive it.
+    from services.warmup import warm_models, timed
+    timed(f"worker {worker.pid} models", warm_models)
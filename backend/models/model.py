@@ -1,125 +1,309 @@
-import pandas as pd
-from pathlib import Path
+"""Training pipeline for the churn model.
+
+    python backend/models/model.py                                   # B30 Pro, defaults
+    python backend/models/model.py --sheets "B30 Pro" N10 --n-iter 40 --folds 5
+    python backend/models/model.py --version 2025-06 --jobs 8        # -> models/versions/2025-06/
+
+Steps:
+1. Read only the requested sheets and columns and derive the features with
+   services/features.py, the same code that scores uploads. A workbook that
+   was uploaded reuses its persisted feature store. The features are cached
+   per (workbook version, sheets), so reruns skip the Excel parse.
+2. Hold out a test split.
+3. Random hyperparameter search with stratified k-fold CV. Every
+   (candidate, fold) fit runs in parallel across cores with early stopping,
+   and each finished fold is appended to a checkpoint. An interrupted search
+   resumes where it stopped.
+4. Refit the best candidate on the whole training split and evaluate it on
+   the test split. The model, scaler and metrics are written where the model
+   registry picks them up.
+"""
+import os
+import sys
 import json
-from sklearn.model_selection import train_test_split
+import time
+import hashlib
+import argparse
+import pandas as pd
+import numpy as np
+from sklearn.model_selection import train_test_split, StratifiedKFold, ParameterSampler
 from sklearn.preprocessing import StandardScaler
-from imblearn.over_sampling import SMOTE
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
+from imblearn.over_sampling import SMOTE
 import xgboost as xgb
 import joblib
 
-# Load the Excel file
-filepath = "backend/userfiles/UW_Churn_Pred_Data.xls"
-xls = pd.ExcelFile(filepath)
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+# The feature code is shared with the backend services
+sys.path.insert(0, os.path.dirname(MODELS_DIR))
+from services.features import DATE_COLUMNS, DATE_FORMAT, FEATURE_COLUMNS, derive_features, model_features, get_sheet_features
+from services.columnar_store import load_manifest
+from services.sheet_cache import read_sheet
+
+DEFAULT_DATA = os.path.join(MODELS_DIR, "..", "userfiles", "UW_Churn_Pred_Data.xls")
+CACHE_DIR = os.path.join(MODELS_DIR, ".cache")
+MODEL_FILE = "churn_model_xgb.joblib"
+PREPROCESSOR_FILE = "preprocessor.joblib"
+METRICS_FILE = "model_metrics.json"
 
 # List of churn-related columns we want to unify
-churn_cols = ['Chrn Flag', 'Churn', 'Churn Flag']
-
-# Load all sheets into a dictionary of dataframes
-dfs = {s: pd.read_excel(xls, sheet_name=s) for s in xls.sheet_names}
-
-# Loop through each sheet and clean the churn column
-for name, df in dfs.items():
-    # Find the churn column and standardize the name
-    for col in churn_cols:
-        if col in df.columns:
-            df['Churn'] = df[col]  # unify churn column
-            break
-    # Drop the original churn-like columns after renaming
-    for col in churn_cols:
-        if col in df.columns and col != 'Churn':
-            df.drop(columns=col, inplace=True)
-
-# Focus on the "B30 Pro" sheet for training the model
-df_b30 = dfs["B30 Pro"]
-
-# Filter out rows where Churn is missing
-df_b30_filtered = df_b30.dropna(subset=['Churn'])
-
-# Focus only on 'last boot - active' and 'last boot - interval' columns for features
-X = df_b30_filtered[['last boot - active', 'last boot - interval']]
-y = df_b30_filtered['Churn']
-
-# Split the dataset into training and testing sets (80% train, 20% test)
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Handle class imbalance using SMOTE (Synthetic Minority Over-sampling Technique)
-smote = SMOTE(random_state=42)
-X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
-
-# Scale the numerical features (StandardScaler)
-scaler = StandardScaler()
-X_train_resampled_scaled = scaler.fit_transform(X_train_resampled)
-X_test_scaled = scaler.transform(X_test)
-
-# Initialize the XGBoost Classifier
-xgb_model = xgb.XGBClassifier(
-    scale_pos_weight=5,  # Adjust this for class imbalance
-    random_state=42,
-    eval_metric='logloss'  # Avoid warning related to XGBoost 1.3+
-)
-
-# Train the XGBoost model
-xgb_model.fit(X_train_resampled_scaled, y_train_resampled)
-
-# Predict
-y_pred = xgb_model.predict(X_test_scaled)
-y_pred_proba = xgb_model.predict_proba(X_test_scaled)[:, 1]
-
-# Print the classification report and confusion matrix
-print("Classification Report:")
-print(classification_report(y_test, y_pred))
-
-print("Confusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
-
-# Calculate and print the AUC-ROC score
-print("AUC-ROC Score:", roc_auc_score(y_test, y_pred_proba))
-
-# Save the model
-joblib.dump(xgb_model, './backend/models/churn_model_xgb.joblib')
-
-# Save the preprocessor (scaler)
-joblib.dump(scaler, './backend/models/preprocessor.joblib')
-
-metrics = {
-    "classification_report": classification_report(y_test, y_pred, output_dict=True),
-    "confusion_matrix": confusion_matrix(y_test, y_pred).tolist(),
-    "roc_auc": roc_auc_score(y_test, y_pred_proba)
+CHURN_COLUMNS = ['Chrn Flag', 'Churn', 'Churn Flag']
+TARGET = 'Churn'
+FEATURES = FEATURE_COLUMNS
+# Bump when the feature extraction changes, so cached features are rebuilt
+FEATURE_VERSION = 2
+
+# The original hand-tuned model is always candidate 0
+BASE_PARAMS = {"scale_pos_weight": 5}
+PARAM_SPACE = {
+    "max_depth": [3, 4, 5, 6, 8],
+    "learning_rate": [0.01, 0.03, 0.05, 0.1, 0.2],
+    "subsample": [0.6, 0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+    "min_child_weight": [1, 3, 5, 10],
+    "gamma": [0, 0.1, 0.5, 1],
+    "reg_lambda": [0.5, 1, 2, 5],
+    "scale_pos_weight": [1, 3, 5, 10]
 }
+# Upper bound on trees; early stopping picks the actual count per fold
+MAX_ESTIMATORS = 2000
+
+
+def file_key(*parts):
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def sheet_features(df, features):
+    # Unify the churn column, keep labelled rows and the model's features
+    target = next((c for c in CHURN_COLUMNS if c in df.columns), None)
+    if target is None:
+        raise KeyError(f"Required columns missing: {TARGET}")
+    out = model_features(features).assign(**{TARGET: pd.to_numeric(df[target], errors='coerce').to_numpy()})
+    out = out.dropna(subset=[TARGET])
+    return out.astype({c: np.float32 for c in FEATURES}).astype({TARGET: np.int8})
+
+
+def read_training_sheets(data_path, sheets):
+    """(frame, features) per sheet; features are derived exactly as at serving time."""
+    wanted = DATE_COLUMNS + FEATURES + CHURN_COLUMNS
+    manifest = load_manifest(data_path)
+    if manifest is not None and all(s in manifest["files"] for s in sheets):
+        # An uploaded workbook: reuse its Parquet copy and persisted feature store
+        return [(read_sheet(data_path, s, columns=[c for c in manifest["columns"][s] if c in CHURN_COLUMNS]),
+                 get_sheet_features(data_path, s)) for s in sheets]
+
+    # Otherwise parse only the needed sheets and columns, dates included
+    frames = pd.read_excel(data_path, sheet_name=list(sheets), usecols=lambda c: c in wanted)
+    return [(frames[s], derive_features(frames[s])) for s in sheets]
+
+
+def load_features(data_path, sheets, cache_dir=CACHE_DIR):
+    """Features + target of the given sheets, cached per workbook version."""
+    st = os.stat(data_path)
+    # DATE_FORMAT decides how ambiguous dates parse, so it is part of the key
+    key = file_key(os.path.abspath(data_path), st.st_mtime_ns, st.st_size, sorted(sheets), FEATURES, FEATURE_VERSION,
+                   DATE_FORMAT)
+    cache_path = os.path.join(cache_dir, f"features_{key}.pkl")
+    if os.path.exists(cache_path):
+        print(f"Using cached features {cache_path}")
+        return pd.read_pickle(cache_path), key
+
+    df = pd.concat([sheet_features(frame, features) for frame, features in read_training_sheets(data_path, sheets)],
+                   ignore_index=True)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, cache_path)
+    return df, key
+
+
+def resample(X, y, seed):
+    # Handle class imbalance using SMOTE, only ever on training rows
+    k = min(5, int(np.bincount(y).min()) - 1)
+    if k < 1:
+        return X, y
+    return SMOTE(random_state=seed, k_neighbors=k).fit_resample(X, y)
+
+
+def make_model(params, seed, n_estimators, early_stopping_rounds=None, n_jobs=1):
+    return xgb.XGBClassifier(
+        **params,
+        n_estimators=n_estimators,
+        early_stopping_rounds=early_stopping_rounds,
+        tree_method="hist",
+        n_jobs=n_jobs,
+        random_state=seed,
+        eval_metric='logloss'
+    )
+
+
+def fit_fold(candidate, params, fold, X, y, train_idx, val_idx, use_smote, seed, early_stopping_rounds):
+    """One (candidate, fold) fit; runs in a worker process with a single XGBoost thread."""
+    start = time.perf_counter()
+    X_train, y_train = X[train_idx], y[train_idx]
+    if use_smote:
+        X_train, y_train = resample(X_train, y_train, seed)
+    scaler = StandardScaler().fit(X_train)
+    X_val = scaler.transform(X[val_idx])
+
+    model = make_model(params, seed, MAX_ESTIMATORS, early_stopping_rounds)
+    model.fit(scaler.transform(X_train), y_train, eval_set=[(X_val, y[val_idx])], verbose=False)
+    proba = model.predict_proba(X_val)[:, 1]
+    return {
+        "candidate": candidate,
+        "params": params,
+        "fold": fold,
+        "auc": float(roc_auc_score(y[val_idx], proba)),
+        "best_iteration": int(model.best_iteration),
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+def load_checkpoint(path):
+    # Finished folds keyed by (params, fold); a torn last line is ignored
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            done[(json.dumps(result["params"], sort_keys=True), result["fold"])] = result
+    return done
+
+
+def search(X, y, args, dataset_key):
+    """Parallel random search over PARAM_SPACE with k-fold CV; returns (best params, per-candidate summary)."""
+    folds = max(2, min(args.folds, int(np.bincount(y).min())))
+    candidates = [dict(BASE_PARAMS)] + list(ParameterSampler(PARAM_SPACE, args.n_iter, random_state=args.seed))
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=args.seed).split(X, y))
+
+    search_key = file_key(dataset_key, folds, args.seed, args.test_size, not args.no_smote, args.early_stopping_rounds)
+    checkpoint = os.path.join(args.cache_dir, f"search_{search_key}.jsonl")
+    # Only fits of this run's candidates count: a checkpoint written with another
+    # --n-iter (or an edited PARAM_SPACE) can hold candidates that aren't searched now
+    wanted = {(json.dumps(params, sort_keys=True), k) for params in candidates for k in range(folds)}
+    done = {} if args.fresh else {key: r for key, r in load_checkpoint(checkpoint).items() if key in wanted}
+    tasks = [(i, params, k) for i, params in enumerate(candidates) for k in range(folds)
+             if (json.dumps(params, sort_keys=True), k) not in done]
+    print(f"{len(candidates)} candidates x {folds} folds: {len(done)} fits from checkpoint, {len(tasks)} to run")
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    # --fresh starts the checkpoint over instead of appending to the old fits
+    with open(checkpoint, "w" if args.fresh else "a") as out:
+        # Results stream back as they finish, so each one is checkpointed right away
+        fits = joblib.Parallel(n_jobs=args.jobs, return_as="generator")(
+            joblib.delayed(fit_fold)(i, params, k, X, y, splits[k][0], splits[k][1],
+                                     not args.no_smote, args.seed, args.early_stopping_rounds)
+            for i, params, k in tasks
+        )
+        for result in fits:
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            done[(json.dumps(result["params"], sort_keys=True), result["fold"])] = result
+
+    summary = {}
+    for result in done.values():
+        key = json.dumps(result["params"], sort_keys=True)
+        entry = summary.setdefault(key, {"params": result["params"], "aucs": [], "iterations": []})
+        entry["aucs"].append(result["auc"])
+        entry["iterations"].append(result["best_iteration"])
+    # A candidate is only compared on all folds, never on a lucky subset
+    complete = [entry for entry in summary.values() if len(entry["aucs"]) == folds]
+    ranked = sorted(complete, key=lambda e: -np.mean(e["aucs"]))
+    for entry in ranked:
+        entry["mean_auc"] = float(np.mean(entry["aucs"]))
+        entry["std_auc"] = float(np.std(entry["aucs"]))
+        # Trees for the final fit: what early stopping chose on average
+        entry["n_estimators"] = int(np.mean(entry["iterations"])) + 1
+    return ranked[0], ranked, folds
+
+
+def atomic_dump(obj, path):
+    # The model registry may reload while we write; it must never see half a file
+    tmp_path = path + ".tmp"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def train(args):
+    output_dir = os.path.join(MODELS_DIR, "versions", args.version) if args.version else MODELS_DIR
+    df, dataset_key = load_features(args.data, args.sheets, args.cache_dir)
+    X = df[FEATURES].to_numpy(dtype=np.float32)
+    y = df[TARGET].to_numpy(dtype=np.int64)
+    print(f"{len(df):,d} labelled rows from {', '.join(args.sheets)} ({int(y.sum()):,d} churned)")
 
-metrics_path = Path('./backend/models/model_metrics.json')
-with open(metrics_path, 'w') as f:
-    json.dump(metrics, f, indent=2)
+    # Split the dataset into training and testing sets
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=args.test_size, random_state=args.seed, stratify=y)
 
-# # Focus on the "N10" sheet for prediction
-# df_n10 = dfs["N10"]
+    start = time.perf_counter()
+    best, ranked, folds = search(X_train, y_train, args, dataset_key)
+    print(f"Search took {time.perf_counter() - start:.1f}s; best CV AUC {best['mean_auc']:.4f} "
+          f"± {best['std_auc']:.4f} with {best['n_estimators']} trees: {best['params']}")
 
-# # Filter out rows where Churn is missing in the N10 sheet (for evaluation purposes)
-# df_n10_filtered = df_n10.dropna(subset=['Churn'])
+    # Refit the best candidate on the whole training split, using every core
+    X_fit, y_fit = (X_train, y_train) if args.no_smote else resample(X_train, y_train, args.seed)
+    scaler = StandardScaler()
+    X_fit = scaler.fit_transform(X_fit)
+    X_test_scaled = scaler.transform(X_test)
+    model = make_model(best["params"], args.seed, best["n_estimators"], n_jobs=args.jobs)
+    model.fit(X_fit, y_fit)
 
-# # Focus on 'last boot - active' and 'last boot - interval' columns for features in N10
-# X_n10 = df_n10_filtered[['last boot - active', 'last boot - interval']]
-# y_n10 = df_n10_filtered['Churn']
+    y_pred = model.predict(X_test_scaled)
+    y_pred_proba = model.predict_proba(X_test_scaled)[:, 1]
+    print("Classification Report:")
+    print(classification_report(y_test, y_pred))
+    print("Confusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+    print("AUC-ROC Score:", roc_auc_score(y_test, y_pred_proba))
 
-# # Scale the features for prediction
-# X_n10_scaled = scaler.transform(X_n10)
+    metrics = {
+        "classification_report": classification_report(y_test, y_pred, output_dict=True),
+        "confusion_matrix": confusion_matrix(y_test, y_pred).tolist(),
+        "roc_auc": roc_auc_score(y_test, y_pred_proba),
+        "cv": {
+            "folds": folds,
+            "best_params": best["params"],
+            "n_estimators": best["n_estimators"],
+            "mean_auc": best["mean_auc"],
+            "std_auc": best["std_auc"],
+            "candidates": [{k: e[k] for k in ("params", "mean_auc", "std_auc", "n_estimators")}
+                           for e in ranked[:10]]
+        },
+        "sheets": list(args.sheets),
+        "rows": int(len(df))
+    }
 
-# # Predict churn using the trained XGBoost model
-# y_pred_n10 = xgb_model.predict(X_n10_scaled)
-# y_pred_proba_n10 = xgb_model.predict_proba(X_n10_scaled)[:, 1]
+    os.makedirs(output_dir, exist_ok=True)
+    # Scaler first: the registry reloads when either file changes
+    atomic_dump(scaler, os.path.join(output_dir, PREPROCESSOR_FILE))
+    atomic_dump(model, os.path.join(output_dir, MODEL_FILE))
+    with open(os.path.join(output_dir, METRICS_FILE), "w") as f:
+        json.dump(metrics, f, indent=2)
+    print(f"Saved model, scaler and metrics to {os.path.abspath(output_dir)}")
+    return metrics
 
-# # Print the classification report and confusion matrix for N10 sheet
-# print("Classification Report (N10 Sheet):")
-# print(classification_report(y_n10, y_pred_n10))
 
-# print("Confusion Matrix (N10 Sheet):")
-# print(confusion_matrix(y_n10, y_pred_n10))
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the churn model")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="workbook to train on")
+    parser.add_argument("--sheets", nargs="+", default=["B30 Pro"], help="sheets to train on")
+    parser.add_argument("--version", help="save to models/versions/<version> instead of the current model")
+    parser.add_argument("--n-iter", type=int, default=20, help="random search candidates besides the base one")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--early-stopping-rounds", type=int, default=30)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel fits (-1 = all cores)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-smote", action="store_true", help="train without SMOTE oversampling")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="feature cache and search checkpoints")
+    parser.add_argument("--fresh", action="store_true", help="discard the search checkpoint and start over")
+    return parser.parse_args(argv)
 
-# # Calculate and print the AUC-ROC score for the N10 predictions
-# print("AUC-ROC Score (N10 Sheet):", roc_auc_score(y_n10, y_pred_proba_n10))
 
-# # Compare the predicted churn vs. actual churn for rows with known churn
-# comparison = pd.DataFrame({'Actual Churn': y_n10, 'Predicted Churn': y_pred_n10})
-# print("\nComparison of Actual vs Predicted Churn (N10 Sheet):")
-# print(comparison)
\ No newline at end of file
+if __name__ == "__main__":
+    train(parse_args())
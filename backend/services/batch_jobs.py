@@ -0,0 +1,99 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# Worker processes for batch scoring (override with BATCH_WORKERS)
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", os.cpu_count() or 1))
+# Finished jobs kept for status polling
+BATCH_JOB_HISTORY = 100
+
+
+class BatchJob:
+    def __init__(self, tasks, output_dir, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.tasks = tasks  # list of (label, args)
+        self.output_dir = output_dir
+        self.status = "running" if tasks else "finished"
+        self.created = time.time()
+        self.finished = None if tasks else self.created
+        self.done = 0
+        self.results = {}  # label -> worker return value
+        self.errors = {}  # label -> error message
+
+    def to_dict(self):
+        # Call under the runner lock: done callbacks mutate results/errors,
+        # so the dict gets copies that stay stable while it is serialized
+        total = len(self.tasks)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": total,
+            "done": self.done,
+            "failed": len(self.errors),
+            "progress": round(self.done / total, 3) if total else 1.0,
+            "output_dir": self.output_dir,
+            "results": dict(self.results),
+            "errors": dict(self.errors),
+            "created": self.created,
+            "finished": self.finished
+        }
+
+
+class BatchRunner:
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Started on first use. Workers are spawned, not forked: a fork after this
+        # process has run XGBoost/OpenMP can deadlock in libgomp in the child
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def submit(self, worker, tasks, output_dir, job_id=None):
+        """Run worker(*args) for every (label, args) task in the process pool."""
+        job = BatchJob(tasks, output_dir, job_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs; running ones are always kept
+            finished = [j.id for j in self._jobs.values() if j.finished is not None]
+            while len(self._jobs) > BATCH_JOB_HISTORY and finished:
+                del self._jobs[finished.pop(0)]
+
+        pool = self._pool() if tasks else None
+        for label, args in tasks:
+            future = pool.submit(worker, *args)
+            future.add_done_callback(lambda f, label=label: self._task_done(job, label, f))
+        return job
+
+    def _task_done(self, job, label, future):
+        with self._lock:
+            try:
+                job.results[label] = future.result()
+            except Exception as e:
+                job.errors[label] = str(e)
+            job.done += 1
+            if job.done == len(job.tasks):
+                job.status = "failed" if len(job.errors) == job.done else "finished"
+                job.finished = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+
+batch_runner = BatchRunner(BATCH_WORKERS)
@@ -0,0 +1,128 @@
+import os
+from services.sheet_cache import SheetCache, file_signature, register_cache
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Category bars kept per column, the rest are summed into "Other"
+CHURN_TOP_K = 30
+OTHER_LABEL = "Other"
+DISTRIBUTION_CACHE_MB = int(os.environ.get("DISTRIBUTION_CACHE_MB", 16))
+
+
+def _quantile(sorted_values, starts, counts, q):
+    # Linear interpolation like np.percentile, for every group at once
+    pos = q * (counts - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, counts - 1)
+    frac = pos - lo
+    low, high = sorted_values[starts + lo], sorted_values[starts + hi]
+    return low + (high - low) * frac
+
+
+def grouped_box_stats(values, groups):
+    """Box-plot statistics of values for every group, from one sort and one bincount pass.
+
+    Returns {group: {count, mean, sd, min, q1, median, q3, max, lowerfence,
+    upperfence}}; groups without finite values map to None.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    groups = np.asarray(groups)
+    group_ids, codes = np.unique(groups, return_inverse=True)
+    result = {str(g): None for g in group_ids}
+
+    finite = np.isfinite(values)
+    values, codes = values[finite], codes[finite]
+    if len(values) == 0:
+        return result
+
+    # One sort by (group, value) lays every group out as a contiguous sorted run
+    order = np.lexsort((values, codes))
+    values, codes = values[order], codes[order]
+    counts = np.bincount(codes, minlength=len(group_ids))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    sums = np.bincount(codes, weights=values, minlength=len(group_ids))
+    present = counts > 0
+    n = np.maximum(counts, 1)
+    means = sums / n
+    sq_dev = np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=len(group_ids))
+    sds = np.sqrt(sq_dev / np.maximum(counts - 1, 1))
+
+    safe_starts, safe_counts = np.where(present, starts, 0), n
+    q1 = _quantile(values, safe_starts, safe_counts, 0.25)
+    median = _quantile(values, safe_starts, safe_counts, 0.5)
+    q3 = _quantile(values, safe_starts, safe_counts, 0.75)
+    iqr = q3 - q1
+
+    for i, g in enumerate(group_ids):
+        if not present[i]:
+            continue
+        run = values[starts[i]:starts[i] + counts[i]]
+        # Whiskers: most extreme values still within 1.5 IQR of the box
+        lower = run[np.searchsorted(run, q1[i] - 1.5 * iqr[i], side="left")]
+        upper = run[np.searchsorted(run, q3[i] + 1.5 * iqr[i], side="right") - 1]
+        result[str(g)] = {
+            "count": int(counts[i]),
+            "mean": float(means[i]),
+            "sd": float(sds[i]) if counts[i] > 1 else 0.0,
+            "min": float(run[0]),
+            "q1": float(q1[i]),
+            "median": float(median[i]),
+            "q3": float(q3[i]),
+            "max": float(run[-1]),
+            "lowerfence": float(lower),
+            "upperfence": float(upper)
+        }
+    return result
+
+
+def grouped_counts(series, groups, top_k=CHURN_TOP_K):
+    """Category x group counts from one bincount pass, top_k categories plus "Other"."""
+    codes, categories = pd.factorize(series)
+    group_codes, group_ids = pd.factorize(np.asarray(groups), sort=True)
+    valid = codes >= 0
+    codes, group_codes = codes[valid], group_codes[valid]
+
+    n_groups = len(group_ids)
+    table = np.bincount(codes * n_groups + group_codes,
+                        minlength=len(categories) * n_groups).reshape(len(categories), n_groups)
+
+    totals = table.sum(axis=1)
+    order = np.argsort(-totals, kind="stable")
+    top, rest = order[:top_k], order[top_k:]
+    labels = [str(categories[i]) for i in top]
+    rows = table[top]
+    if len(rest):
+        labels.append(OTHER_LABEL)
+        rows = np.vstack([rows, table[rest].sum(axis=0)])
+
+    return {
+        "type": "counts",
+        "categories": labels,
+        "groups": {str(g): rows[:, j].astype(int).tolist() for j, g in enumerate(group_ids)}
+    }
+
+
+def churn_breakdown(series, churn, numeric):
+    """Per churn value: box statistics for numeric columns, category counts otherwise.
+
+    The result has a fixed size no matter how many rows the sheet has.
+    """
+    churn = np.asarray(churn)
+    if numeric:
+        return {"type": "box", "groups": grouped_box_stats(series.astype(np.float64), churn)}
+    return grouped_counts(series.astype(str).where(series.notna()), churn)
+
+
+distribution_cache = register_cache(
+    "distribution",
+    SheetCache(DISTRIBUTION_CACHE_MB * 1024 * 1024, sizeof=len)
+)
+
+
+def get_distribution_json(filepath, sheet, column, build):
+    # Serialized figure per (file version, sheet, column)
+    key = file_signature(filepath) + (sheet, column)
+    return distribution_cache.get_or_load(key, build)
@@ -0,0 +1,146 @@
+import os
+import json
+from datetime import datetime
+from services.sheet_cache import SheetCache, file_signature, register_cache
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+MISSING_LABEL = "Missing"
+MISSING_LIST = ["unknown", "nknown", "invalid json", "null", "none", "empty", "missing"]
+
+# Persian (U+06F0..) and Arabic-Indic (U+0660..) digits to Latin, built once
+DIGIT_TABLE = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+# Share of sampled distinct values that must parse for a column to count as dates
+DATE_DETECT_RATIO = 0.8
+DATE_SAMPLE_SIZE = 1000
+# Memory budget for cached frequency tables (override with FREQUENCY_CACHE_MB)
+FREQUENCY_CACHE_MB = int(os.environ.get("FREQUENCY_CACHE_MB", 16))
+
+
+def extract_json(value):
+    # True NaN
+    if pd.isna(value):
+        return MISSING_LABEL
+
+    # Empty containers / strings
+    if value in ["", [], {}, "[]"]:
+        return MISSING_LABEL
+
+    # String-specific checks
+    if isinstance(value, str):
+        v = value.strip().lower()
+
+        # Catch common missing/invalid indicators
+        if v in MISSING_LIST:
+            return MISSING_LABEL
+
+        # Try parsing JSON
+        if v.startswith("[{"):
+            try:
+                data = json.loads(value)
+                if isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
+                    # Check for multiple possible keys
+                    for key in ["carrier_name", "name"]:
+                        if key in data[0]:
+                            return data[0][key] if data[0][key] else MISSING_LABEL
+                return MISSING_LABEL
+            except Exception:
+                return MISSING_LABEL
+
+    # Otherwise return the value as-is
+    return value
+
+
+def parse_datetime(value):
+    if pd.isna(value):
+        return None
+    try:
+        # Replace Persian/Arabic numerals with Latin digits
+        value = value.translate(DIGIT_TABLE)
+        # Try ISO parsing first
+        return datetime.fromisoformat(value)
+    except (AttributeError, TypeError, ValueError):
+        # Not a string (e.g. an Excel timestamp), or not ISO
+        try:
+            # Fallback to generic parsing
+            return pd.to_datetime(value, errors='coerce')
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+
+def normalize_label(value):
+    # Same result as extract_json followed by str/strip/title on one cell
+    return str(extract_json(value)).strip().title()
+
+
+def parse_dates(values):
+    """Vectorized datetime parse of an array of strings; unparseable values become NaT."""
+    values = pd.Series(values, dtype=object).str.translate(DIGIT_TABLE)
+    # Everything is parsed as UTC so mixed offsets can share one column
+    try:
+        # Fast C path for ISO strings
+        parsed = pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601")
+    except (TypeError, ValueError):
+        parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, UTC]")
+    rest = parsed.isna() & values.notna()
+    if rest.any():
+        # Per-value parsing only for what is left
+        try:
+            parsed[rest] = pd.to_datetime(values[rest], errors="coerce", utc=True, format="mixed")
+        except (TypeError, ValueError):
+            parsed[rest] = values[rest].map(lambda v: pd.to_datetime(v, errors="coerce", utc=True))
+    return parsed.dt.tz_localize(None)
+
+
+def looks_like_dates(labels):
+    # Decide from a sample of distinct non-missing values instead of every row
+    candidates = labels[labels != MISSING_LABEL]
+    if len(candidates) == 0:
+        return False
+    if len(candidates) > DATE_SAMPLE_SIZE:
+        candidates = np.random.default_rng(0).choice(candidates, DATE_SAMPLE_SIZE, replace=False)
+    return parse_dates(candidates).notna().mean() >= DATE_DETECT_RATIO
+
+
+def column_frequency(series):
+    """Frequency table of a column: per month for date columns, per normalized value otherwise.
+
+    Every distinct raw value is normalized once, then the counts are mapped
+    back through the factorized codes, so the work scales with the number
+    of distinct values rather than rows.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        months = series.dropna().dt.to_period("M")
+        return {str(k): int(v) for k, v in months.value_counts().sort_index().items()}
+
+    codes, uniques = pd.factorize(series)
+    counts = np.bincount(codes + 1, minlength=len(uniques) + 1)  # slot 0 holds NaN
+    missing_count, counts = int(counts[0]), counts[1:]
+
+    labels = np.array([normalize_label(u) for u in uniques], dtype=object)
+
+    if not pd.api.types.is_numeric_dtype(series) and looks_like_dates(labels):
+        months = parse_dates(labels).dt.to_period("M")
+        valid = months.notna().to_numpy()
+        by_month = pd.Series(counts[valid], index=months[valid]).groupby(level=0).sum()
+        return {str(k): int(v) for k, v in by_month.sort_index().items()}
+
+    by_label = pd.Series(counts, index=labels, dtype=np.int64).groupby(level=0).sum()
+    if missing_count:
+        by_label[MISSING_LABEL] = by_label.get(MISSING_LABEL, 0) + missing_count
+    by_label = by_label[by_label > 0].sort_values(ascending=False, kind="stable")
+    return {str(k): int(v) for k, v in by_label.items()}
+
+
+frequency_cache = register_cache(
+    "column_frequency",
+    SheetCache(FREQUENCY_CACHE_MB * 1024 * 1024, sizeof=lambda freq: 64 * (len(freq) + 1))
+)
+
+
+def get_column_frequency(filepath, sheet, column, load_series):
+    key = file_signature(filepath) + (sheet, column)
+    return frequency_cache.get_or_load(key, lambda: column_frequency(load_series()))
@@ -0,0 +1,209 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import importlib.util
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+# pyarrow itself is only imported when a sheet is first converted or read
+HAVE_PARQUET = importlib.util.find_spec("pyarrow") is not None
+pq = lazy_import("pyarrow.parquet")
+
+# Per-sheet Parquet copies of uploaded workbooks, written once at ingest time
+COLUMNAR_FOLDER = os.path.join(os.getcwd(), "columnar")
+MANIFEST_NAME = "manifest.json"
+
+# Object columns pyarrow cannot store as a single type (e.g. ints mixed with text)
+_MIXED_TYPES = {"mixed", "mixed-integer", "complex", "unknown-array"}
+
+_convert_locks = {}
+_convert_locks_lock = threading.Lock()
+
+
+def _source_signature(filepath):
+    st = os.stat(filepath)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def store_dir(filepath):
+    # Uploads may live in subfolders, so key the store by the full path
+    digest = hashlib.sha1(os.path.abspath(filepath).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(COLUMNAR_FOLDER, digest)
+
+
+def _arrow_safe(df):
+    df.columns = [str(c) for c in df.columns]
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) in _MIXED_TYPES:
+            mask = df[col].notna()
+            df[col] = df[col].where(~mask, df[col].astype(str))
+    return df
+
+
+def load_manifest(filepath):
+    # Returns None when the workbook was never converted or changed since
+    path = os.path.join(store_dir(filepath), MANIFEST_NAME)
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("source") != _source_signature(filepath):
+        return None
+    return manifest
+
+
+def convert_workbook(filepath):
+    if not HAVE_PARQUET:
+        return None
+
+    with _convert_locks_lock:
+        lock = _convert_locks.setdefault(os.path.abspath(filepath), threading.Lock())
+    with lock:
+        manifest = load_manifest(filepath)
+        if manifest is not None:
+            return manifest
+
+        source = _source_signature(filepath)
+        out_dir = store_dir(filepath)
+        tmp_dir = out_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        # One parse of the whole workbook, then one Parquet file per sheet
+        with stage("excel_parse") as s:
+            sheets = pd.read_excel(filepath, sheet_name=None)
+            s.rows = sum(len(df) for df in sheets.values())
+        manifest = {"source": source, "sheets": [], "files": {}, "columns": {}}
+        for i, (name, df) in enumerate(sheets.items()):
+            df = _arrow_safe(df)
+            filename = f"sheet_{i}.parquet"
+            with stage("parquet_write", rows=len(df)):
+                df.to_parquet(os.path.join(tmp_dir, filename), index=False)
+            manifest["sheets"].append(name)
+            manifest["files"][name] = filename
+            manifest["columns"][name] = {c: str(t) for c, t in df.dtypes.items()}
+
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp_dir, out_dir)
+        return manifest
+
+
+def ensure_converted(filepath):
+    manifest = load_manifest(filepath)
+    if manifest is None:
+        try:
+            manifest = convert_workbook(filepath)
+        except Exception as e:
+            # Readers fall back to parsing the workbook directly
+            print(f"Columnar conversion failed for {filepath}: {e}")
+            manifest = None
+    return manifest
+
+
+def load_sheet(filepath, sheet, columns=None):
+    manifest = ensure_converted(filepath)
+    if manifest is None or sheet not in manifest["files"]:
+        with stage("excel_parse") as s:
+            df = pd.read_excel(filepath, sheet_name=sheet, usecols=columns)
+            s.rows = len(df)
+        df.columns = [str(c) for c in df.columns]
+        return df
+
+    path = os.path.join(store_dir(filepath), manifest["files"][sheet])
+    with stage("parquet_read") as s:
+        df = pd.read_parquet(path, columns=columns)
+        s.rows = len(df)
+    return df
+
+
+def sheet_artifact_path(filepath, sheet, suffix):
+    # Derived per-sheet files (profiles, features) live next to the sheet's Parquet
+    # file, so re-conversion drops them too; None when the sheet has no store
+    manifest = load_manifest(filepath)
+    if manifest is None or sheet not in manifest["files"]:
+        return None
+    name = os.path.splitext(manifest["files"][sheet])[0]
+    return os.path.join(store_dir(filepath), f"{name}.{suffix}")
+
+
+def remove_store(filepath):
+    shutil.rmtree(store_dir(filepath), ignore_errors=True)
+
+
+def clone_store(source_path, target_path):
+    """Reuse the converted sheets (and profiles) of source_path for identical target_path.
+
+    Returns the new manifest, or None if the source has no valid store.
+    """
+    manifest = load_manifest(source_path)
+    if manifest is None:
+        return None
+
+    out_dir = store_dir(target_path)
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.copytree(store_dir(source_path), tmp_dir)
+
+    # Same bytes, different file: only the source signature changes
+    manifest["source"] = _source_signature(target_path)
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+def estimate_row_bytes(filepath, sheet, columns=None):
+    # Uncompressed Parquet bytes per row for the given columns, None if unknown
+    manifest = load_manifest(filepath)
+    if manifest is None or sheet not in manifest["files"]:
+        return None
+    meta = pq.ParquetFile(os.path.join(store_dir(filepath), manifest["files"][sheet])).metadata
+    if meta.num_rows == 0:
+        return None
+    wanted = set(columns) if columns is not None else None
+    total = 0
+    for rg in range(meta.num_row_groups):
+        group = meta.row_group(rg)
+        for c in range(group.num_columns):
+            chunk = group.column(c)
+            if wanted is None or chunk.path_in_schema in wanted:
+                total += chunk.total_uncompressed_size
+    return max(1, total // meta.num_rows)
+
+
+def parquet_row_count(filepath, sheet):
+    # From the Parquet footer, no data read; None if the sheet has no store
+    manifest = load_manifest(filepath)
+    if manifest is None or sheet not in manifest["files"]:
+        return None
+    return pq.ParquetFile(os.path.join(store_dir(filepath), manifest["files"][sheet])).metadata.num_rows
+
+
+def iter_sheet_batches(filepath, sheet, columns=None, batch_rows=50000):
+    """Yield the sheet as DataFrames of at most batch_rows rows (at least one, possibly empty)."""
+    manifest = ensure_converted(filepath)
+    if manifest is None or sheet not in manifest["files"]:
+        # No columnar copy: parse once, then hand out slices
+        df = load_sheet(filepath, sheet, columns)
+        for start in range(0, max(len(df), 1), batch_rows):
+            yield df.iloc[start:start + batch_rows].reset_index(drop=True)
+        return
+
+    pf = pq.ParquetFile(os.path.join(store_dir(filepath), manifest["files"][sheet]))
+    empty = True
+    for batch in pf.iter_batches(batch_size=batch_rows, columns=columns):
+        empty = False
+        with stage("parquet_read", rows=batch.num_rows):
+            df = batch.to_pandas()
+        yield df
+    if empty:
+        yield pf.schema_arrow.empty_table().select(columns or pf.schema_arrow.names).to_pandas()
@@ -0,0 +1,159 @@
+import os
+from services.sheet_cache import SheetCache, file_signature, register_cache, get_sheet_columns
+from services.columnar_store import iter_sheet_batches
+from services.features import DATE_COLUMNS, FEATURE_COLUMNS, get_aligned_features
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+go = lazy_import("plotly.graph_objects")
+
+CORRELATION_BATCH_ROWS = int(os.environ.get("CORRELATION_BATCH_ROWS", 100000))
+HEATMAP_CACHE_MB = int(os.environ.get("HEATMAP_CACHE_MB", 32))
+
+
+class CorrelationAccumulator:
+    """Pairwise-complete Pearson correlation from sums gathered chunk by chunk.
+
+    Matches DataFrame.corr(): each pair only uses rows where both values are
+    present. Values are shifted by the first chunk's column means before
+    accumulating, which keeps the float64 sums well conditioned.
+    """
+
+    def __init__(self, columns):
+        p = len(columns)
+        self.columns = list(columns)
+        self.shift = None
+        self.rows = 0
+        self.n = np.zeros((p, p))    # rows where both i and j are present
+        self.sx = np.zeros((p, p))   # sum of x_i over those rows
+        self.sxx = np.zeros((p, p))  # sum of x_i^2 over those rows
+        self.sxy = np.zeros((p, p))  # sum of x_i * x_j
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        X = chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = np.isfinite(X)
+        if self.shift is None:
+            counts = present.sum(axis=0)
+            sums = np.where(present, X, 0.0).sum(axis=0)
+            self.shift = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        X = np.where(present, X - self.shift, 0.0)
+        M = present.astype(np.float64)
+
+        self.n += M.T @ M
+        self.sx += X.T @ M
+        self.sxx += (X * X).T @ M
+        self.sxy += X.T @ X
+
+    def corr(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = self.sxy - self.sx * self.sx.T / self.n
+            var_i = self.sxx - self.sx ** 2 / self.n
+            corr = cov / np.sqrt(var_i * var_i.T)
+        corr[self.n < 1] = np.nan
+        return pd.DataFrame(np.clip(corr, -1, 1), index=self.columns, columns=self.columns)
+
+
+def sheet_correlation(filepath, sheet):
+    """Correlation of the numeric and derived date columns, or None if there are none (or no rows)."""
+    dtypes = get_sheet_columns(filepath, sheet)
+    numeric = [c for c, t in dtypes.items()
+               if c not in DATE_COLUMNS and c not in FEATURE_COLUMNS
+               and pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t)]
+
+    # Derived features come precomputed from the feature store, checked to be row-aligned with the sheet
+    features = get_aligned_features(filepath, sheet)
+    derived = [c for c in FEATURE_COLUMNS if features[c].notna().any()]
+    columns = numeric + derived
+    if not columns:
+        return None
+
+    accumulator = CorrelationAccumulator(columns)
+    offset = 0
+    for chunk in _numeric_chunks(filepath, sheet, numeric, len(features)):
+        part = features[derived].iloc[offset:offset + len(chunk)].reset_index(drop=True)
+        offset += len(chunk)
+        chunk = pd.concat([chunk.reset_index(drop=True), part], axis=1)
+        with stage("correlation", rows=len(chunk)):
+            accumulator.update(chunk)
+    # Columns but no rows: nothing to correlate, same answer as no numeric columns
+    return accumulator.corr() if accumulator.rows else None
+
+
+def _numeric_chunks(filepath, sheet, numeric, rows):
+    if numeric:
+        return iter_sheet_batches(filepath, sheet, columns=numeric, batch_rows=CORRELATION_BATCH_ROWS)
+    # Only derived columns: empty frames that just carry the batch lengths
+    return (pd.DataFrame(index=range(min(CORRELATION_BATCH_ROWS, rows - start)))
+            for start in range(0, rows, CORRELATION_BATCH_ROWS))
+
+
+def top_correlated(corr_df, top_n):
+    # Keep the columns with the strongest correlation to any other column
+    strength = corr_df.abs().where(~np.eye(len(corr_df), dtype=bool)).max().fillna(0)
+    keep = strength.sort_values(ascending=False, kind="stable").index[:top_n]
+    keep = [c for c in corr_df.columns if c in set(keep)]
+    return corr_df.loc[keep, keep]
+
+
+def heatmap_json(corr_df):
+    with stage("plotly"):
+        return _heatmap_figure(corr_df).to_json()
+
+
+def _heatmap_figure(corr_df):
+    # Create Plotly heatmap
+    fig = go.Figure(
+        data=go.Heatmap(
+            z=corr_df.values,
+            x=corr_df.columns,
+            y=corr_df.columns,
+            colorscale='RdBu',
+            zmin=-1,
+            zmax=1,
+            colorbar=dict(title="Correlation")
+        )
+    )
+
+    fig.update_layout(
+        xaxis_title="Columns",
+        yaxis_title="Columns",
+        autosize=True,
+        margin=dict(l=100, r=100, t=100, b=100)
+    )
+    return fig
+
+
+correlation_cache = register_cache(
+    "correlation",
+    SheetCache(HEATMAP_CACHE_MB * 1024 * 1024,
+               sizeof=lambda item: len(item) if isinstance(item, str) else int(item.memory_usage().sum()))
+)
+
+
+def get_correlation(filepath, sheet):
+    key = file_signature(filepath) + (sheet, "matrix")
+    # An empty frame stands for "no numeric columns" so that answer is cached too
+    result = correlation_cache.get_or_load(key, lambda: _or_empty(sheet_correlation(filepath, sheet)))
+    return None if result.empty else result
+
+
+def _or_empty(corr_df):
+    return pd.DataFrame() if corr_df is None else corr_df
+
+
+def get_heatmap_json(filepath, sheet, top_n=None):
+    """Serialized Plotly figure for the heatmap, '' when the sheet has no numeric columns."""
+    key = file_signature(filepath) + (sheet, "heatmap", top_n)
+
+    def build():
+        corr_df = get_correlation(filepath, sheet)
+        if corr_df is None:
+            return ""
+        if top_n:
+            corr_df = top_correlated(corr_df, top_n)
+        return heatmap_json(corr_df.round(3))
+
+    return correlation_cache.get_or_load(key, build)
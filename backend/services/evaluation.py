@@ -0,0 +1,133 @@
+import os
+from services.sheet_cache import SheetCache, file_signature, register_cache
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Score resolution of the histograms; AUC and the sweep are exact up to one bin
+EVALUATION_BINS = int(os.environ.get("EVALUATION_BINS", 10000))
+# Cutoffs returned in the threshold sweep: 0, 1/SWEEP_POINTS, ..., 1
+SWEEP_POINTS = int(os.environ.get("SWEEP_POINTS", 100))
+EVALUATION_CHUNK_ROWS = int(os.environ.get("EVALUATION_CHUNK_ROWS", 1000000))
+
+
+class ScoreHistogram:
+    """Per-label score counts gathered chunk by chunk.
+
+    Memory is O(bins) whatever the number of rows. The confusion matrix at
+    the model's own threshold is counted exactly from its labels; ROC AUC
+    and the threshold sweep come from the histograms, scores in the same
+    bin counting as ties.
+    """
+
+    def __init__(self, bins=EVALUATION_BINS):
+        self.bins = bins
+        self.pos = np.zeros(bins, dtype=np.int64)
+        self.neg = np.zeros(bins, dtype=np.int64)
+        self.confusion = np.zeros((2, 2), dtype=np.int64)  # [actual][predicted]
+
+    def update(self, proba, y_pred, y_true):
+        # y_true: 1/0 per row; other values (missing labels) are skipped
+        positive = y_true == 1
+        negative = y_true == 0
+        idx = np.clip((proba * self.bins).astype(np.int64), 0, self.bins - 1)
+        self.pos += np.bincount(idx[positive], minlength=self.bins)
+        self.neg += np.bincount(idx[negative], minlength=self.bins)
+
+        predicted = y_pred == 1
+        self.confusion += [[np.count_nonzero(negative & ~predicted), np.count_nonzero(negative & predicted)],
+                           [np.count_nonzero(positive & ~predicted), np.count_nonzero(positive & predicted)]]
+
+    @property
+    def rows(self):
+        return int(self.confusion.sum())
+
+    @property
+    def nbytes(self):
+        return self.pos.nbytes + self.neg.nbytes + self.confusion.nbytes
+
+    def roc_auc(self):
+        # Probability a random positive outscores a random negative; None with one class
+        n_pos, n_neg = self.pos.sum(), self.neg.sum()
+        if n_pos == 0 or n_neg == 0:
+            return None
+        below = np.cumsum(self.neg) - self.neg
+        return float((self.pos * (below + 0.5 * self.neg)).sum() / (n_pos * n_neg))
+
+    def sweep(self, points=SWEEP_POINTS):
+        """Precision/recall/F1 for cutoffs 0..1: rows scoring >= threshold count as churn.
+
+        The cutoff is inclusive like the engine's labels (proba >= THRESHOLD), so
+        the 0.5 row agrees with the confusion matrix. XGBClassifier.predict's
+        "> 0.5" would differ only for scores of exactly 0.5.
+        """
+        # Counts at or above each bin edge, plus the empty tail at threshold 1
+        tp_at = np.append(np.cumsum(self.pos[::-1])[::-1], 0)
+        fp_at = np.append(np.cumsum(self.neg[::-1])[::-1], 0)
+        n_pos = int(self.pos.sum())
+
+        rows = []
+        for i in range(points + 1):
+            threshold = i / points
+            k = min(self.bins, int(round(threshold * self.bins)))
+            tp, fp = int(tp_at[k]), int(fp_at[k])
+            precision, recall = _ratio(tp, tp + fp), _ratio(tp, n_pos)
+            rows.append({
+                "threshold": round(threshold, 4),
+                "precision": round(precision, 4),
+                "recall": round(recall, 4),
+                "f1": round(_ratio(2 * precision * recall, precision + recall), 4),
+                "predicted_positive": tp + fp
+            })
+        return rows
+
+    def classification_report(self):
+        # Same keys and zero_division=0 semantics as sklearn's output_dict report
+        report = {}
+        support = self.confusion.sum(axis=1)
+        predicted = self.confusion.sum(axis=0)
+        for label in (0, 1):
+            hits = int(self.confusion[label, label])
+            precision, recall = _ratio(hits, predicted[label]), _ratio(hits, support[label])
+            report[str(label)] = {
+                "precision": precision,
+                "recall": recall,
+                "f1-score": _ratio(2 * precision * recall, precision + recall),
+                "support": int(support[label])
+            }
+
+        total = max(self.rows, 1)
+        report["accuracy"] = float(np.trace(self.confusion)) / total
+        for name, weights in (("macro avg", np.array([0.5, 0.5])), ("weighted avg", support / total)):
+            report[name] = {
+                metric: float(sum(w * report[str(label)][metric] for label, w in zip((0, 1), weights)))
+                for metric in ("precision", "recall", "f1-score")
+            }
+            report[name]["support"] = self.rows
+        return report
+
+
+def _ratio(numerator, denominator):
+    return float(numerator) / float(denominator) if denominator else 0.0
+
+
+def evaluate(scored, y_true, chunk_rows=EVALUATION_CHUNK_ROWS):
+    # One pass over cached predictions; temporaries stay at chunk_rows rows
+    if len(y_true) != len(scored):
+        raise ValueError(f"{len(y_true)} labels for {len(scored)} scored rows: labels and scores must "
+                         "come from the same rows of the same sheet")
+    histogram = ScoreHistogram()
+    with stage("evaluation", rows=len(scored)):
+        for start in range(0, len(scored), chunk_rows):
+            end = start + chunk_rows
+            histogram.update(scored.proba[start:end], scored.label[start:end], y_true[start:end])
+    return histogram
+
+
+evaluation_cache = register_cache("evaluation", SheetCache(4 * 1024 * 1024, sizeof=lambda h: h.nbytes))
+
+
+def get_evaluation(filepath, sheet, model_version, loader):
+    key = file_signature(filepath) + (sheet, model_version)
+    return evaluation_cache.get_or_load(key, loader)
@@ -0,0 +1,127 @@
+import os
+from services.sheet_cache import SheetCache, file_signature, register_cache, frame_nbytes, read_sheet, get_sheet_columns, get_sheet_names, get_sheet_row_count
+from services.columnar_store import sheet_artifact_path
+from services.column_normalizer import DIGIT_TABLE
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DATE_COLUMNS = ['active_date', 'last_boot_date', 'interval_date']
+# Model features in training order: name -> (later date, earlier date), in days
+DERIVED_FEATURES = {
+    'last boot - active': ('last_boot_date', 'active_date'),
+    'last boot - interval': ('last_boot_date', 'interval_date')
+}
+FEATURE_COLUMNS = list(DERIVED_FEATURES)
+
+# Format of the NUU exports; anything else goes through the slow per-value parse
+DATE_FORMAT = os.environ.get("DATE_FORMAT", "%Y-%m-%d %H:%M:%S")
+FEATURE_CACHE_MB = int(os.environ.get("FEATURE_CACHE_MB", 64))
+
+
+def parse_date_column(series):
+    """Naive datetime64 column; unparseable values become NaT."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.tz_localize(None) if series.dt.tz is not None else series
+
+    # Vectorized fast path for the export format
+    parsed = pd.to_datetime(series, format=DATE_FORMAT, errors="coerce")
+    rest = parsed.isna() & series.notna()
+    if rest.any():
+        # Stragglers: other layouts, Persian digits, explicit offsets (converted to UTC)
+        values = series[rest].astype(str).str.translate(DIGIT_TABLE)
+        try:
+            fallback = pd.to_datetime(values, errors="coerce", format="mixed", utc=True)
+        except (TypeError, ValueError):
+            fallback = pd.to_datetime(values.map(lambda v: pd.to_datetime(v, errors="coerce", utc=True)), utc=True)
+        parsed[rest] = fallback.dt.tz_localize(None)
+    return parsed
+
+
+def derive_features(df):
+    """Parsed date columns plus the derived day differences, row-aligned with df.
+
+    A feature whose dates are missing falls back to a precomputed column of
+    the same name, else NaN.
+    """
+    out = pd.DataFrame(index=df.index)
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            out[col] = parse_date_column(df[col])
+
+    for name, (end, start) in DERIVED_FEATURES.items():
+        if end in out.columns and start in out.columns:
+            out[name] = (out[end] - out[start]).dt.total_seconds() / (3600*24)
+        elif name in df.columns:
+            out[name] = pd.to_numeric(df[name], errors="coerce").astype(np.float64)
+        else:
+            out[name] = np.nan
+    return out
+
+
+def model_features(features):
+    # What the model sees: the derived columns, unknown values as 0
+    return features[FEATURE_COLUMNS].fillna(0)
+
+
+def build_sheet_features(filepath, sheet):
+    columns = get_sheet_columns(filepath, sheet)
+    needed = [c for c in DATE_COLUMNS + FEATURE_COLUMNS if c in columns]
+    # With no source columns, one column still gives the row count
+    df = read_sheet(filepath, sheet, columns=needed or list(columns)[:1], copy=False)
+    with stage("features", rows=len(df)):
+        return derive_features(df.reset_index(drop=True))
+
+
+def load_or_build_features(filepath, sheet):
+    # Persisted next to the sheet's Parquet file, so a re-upload rebuilds them
+    path = sheet_artifact_path(filepath, sheet, "features.parquet")
+    if path is not None and os.path.exists(path):
+        with stage("parquet_read") as s:
+            features = pd.read_parquet(path)
+            s.rows = len(features)
+        return features
+
+    features = build_sheet_features(filepath, sheet)
+    if path is not None:
+        tmp_path = path + ".tmp"
+        features.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return features
+
+
+feature_cache = register_cache("features", SheetCache(FEATURE_CACHE_MB * 1024 * 1024, sizeof=frame_nbytes))
+
+
+def get_sheet_features(filepath, sheet):
+    """Features of every row of the sheet, computed once per file version.
+
+    The frame is shared between requests: slice or copy it, never modify it.
+    """
+    key = file_signature(filepath) + (sheet,)
+    return feature_cache.get_or_load(key, lambda: load_or_build_features(filepath, sheet))
+
+
+def get_aligned_features(filepath, sheet):
+    """get_sheet_features, checked to hold exactly one row per sheet row.
+
+    For callers that pair features with sheet rows by position: a mismatch
+    would give rows another row's features instead of failing.
+    """
+    features = get_sheet_features(filepath, sheet)
+    rows = get_sheet_row_count(filepath, sheet)
+    if len(features) != rows:
+        raise ValueError(f"Features of {os.path.basename(filepath)} [{sheet}] have {len(features)} rows "
+                         f"but the sheet has {rows}; re-upload the file to rebuild them")
+    return features
+
+
+def featurize_workbook(filepath):
+    # Ingest step: derive the features of every sheet right after upload
+    for sheet in get_sheet_names(filepath):
+        try:
+            get_sheet_features(filepath, sheet)
+        except Exception as e:
+            print(f"Feature extraction failed for {filepath} [{sheet}]: {e}")
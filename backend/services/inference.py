@@ -0,0 +1,113 @@
+import os
+import time
+import argparse
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Threads used by XGBoost for one prediction call; 0 lets XGBoost pick (override with INFERENCE_NTHREAD)
+INFERENCE_NTHREAD = int(os.environ.get("INFERENCE_NTHREAD", 0))
+# Scores at or above this are churn. Inclusive on purpose, and the accuracy
+# sweep uses the same rule; XGBClassifier.predict uses "> 0.5" instead, which
+# only differs for a score of exactly 0.5
+THRESHOLD = 0.5
+
+
+class InferenceEngine:
+    """Scaler + booster in one vectorized pass, without the sklearn wrapper.
+
+    predict() returns float32 probabilities and int8 labels from a single
+    inplace_predict call, so callers needing both never score twice.
+    """
+
+    def __init__(self, model, preprocessor, nthread=INFERENCE_NTHREAD):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.booster = model.get_booster()
+        if nthread:
+            self.booster.set_param({"nthread": nthread})
+
+        # Models trained with early stopping only use trees up to best_iteration
+        try:
+            self.iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            self.iteration_range = (0, 0)
+
+        # A StandardScaler is folded into the array step; anything else runs as-is
+        self.mean = getattr(preprocessor, "mean_", None)
+        self.scale = getattr(preprocessor, "scale_", None)
+        self.fold_scaler = type(preprocessor).__name__ == "StandardScaler"
+
+    def transform(self, features):
+        if not self.fold_scaler:
+            X = self.preprocessor.transform(features)
+            return np.ascontiguousarray(X, dtype=np.float32)
+
+        # Scale in float64 like sklearn does, then hand XGBoost one float32 block
+        X = np.array(features, dtype=np.float64)
+        # Folding the scaler skips sklearn's own input validation, so check the width here
+        expected = len(self.mean) if self.mean is not None else getattr(self.preprocessor, "n_features_in_", None)
+        if X.ndim != 2 or (expected is not None and X.shape[1] != expected):
+            raise ValueError(f"Expected {expected} feature columns, got shape {X.shape}")
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def predict(self, features):
+        X = self.transform(features)
+        if len(X) == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int8)
+
+        proba = self.booster.inplace_predict(X, iteration_range=self.iteration_range)
+        if proba.ndim == 2:
+            proba = proba[:, 1]
+        proba = proba.astype(np.float32, copy=False)
+        return proba, (proba >= THRESHOLD).astype(np.int8)
+
+
+def predict_sklearn(model, preprocessor, features):
+    # The previous path: scaler.transform, then predict and predict_proba separately
+    X = preprocessor.transform(features)
+    labels = model.predict(X)
+    proba = model.predict_proba(X)[:, 1]
+    return proba, labels
+
+
+def benchmark(bundle, rows=1000000, repeat=3):
+    """Rows/second of the sklearn-wrapper path and the inference engine on random features."""
+    rng = np.random.default_rng(0)
+    n_features = len(getattr(bundle.preprocessor, "mean_", [])) or 2
+    features = rng.normal(0, 100, size=(rows, n_features))
+
+    results = {}
+    for name, fn in [("sklearn", lambda: predict_sklearn(bundle.model, bundle.preprocessor, features)),
+                     ("engine", lambda: bundle.engine.predict(features))]:
+        best = min(_timed(fn) for _ in range(repeat))
+        results[name] = {"seconds": round(best, 4), "rows_per_second": int(rows / best)}
+    return results
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # python -m services.inference --rows 1000000 --nthread 4   (run from backend/)
+    from services.model_registry import get_model
+
+    parser = argparse.ArgumentParser(description="Compare old and new inference throughput")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--nthread", type=int, default=INFERENCE_NTHREAD)
+    args = parser.parse_args()
+
+    bundle = get_model(args.model)
+    if args.nthread:
+        bundle.engine.booster.set_param({"nthread": args.nthread})
+    for name, result in benchmark(bundle, args.rows, args.repeat).items():
+        print(f"{name:8s} {result['rows_per_second']:>12,d} rows/s  ({result['seconds']}s for {args.rows:,d} rows)")
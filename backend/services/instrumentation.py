@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import uuid
+import threading
+from collections import defaultdict
+from flask import g, request, has_app_context
+
+# Histogram buckets (seconds) for request latency
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_PREFIX = "nuu"
+# Sampling profiler: off unless PROFILING=1, then per request with ?profile=1
+PROFILING = os.environ.get("PROFILING", "0") == "1"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000
+PROFILES_FOLDER = os.path.join(os.getcwd(), "profiles")
+PROFILE_HISTORY = 50
+
+
+class Stage:
+    # One timed section; set .rows inside the block to report rows processed
+    __slots__ = ("name", "rows", "start", "seconds")
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+        self.start = None
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        metrics.record_stage(self)
+
+
+def stage(name, rows=None):
+    """Time a pipeline stage (parse, preprocess, inference, plotly, serialize, ...).
+
+    Inside a request the timing goes to that request's Server-Timing header and
+    to /metrics; outside one (background jobs, scripts) only to /metrics.
+    """
+    return Stage(name, rows)
+
+
+def _endpoint():
+    if has_app_context() and "endpoint" in g:
+        return g.endpoint
+    return "background"
+
+
+class Metrics:
+    """Process-wide request and stage counters, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)            # (endpoint, method, status) -> count
+        self.latency = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))  # endpoint -> bucket counts
+        self.latency_sum = defaultdict(float)
+        self.stage_seconds = defaultdict(float)     # (endpoint, stage) -> seconds
+        self.stage_calls = defaultdict(int)
+        self.stage_rows = defaultdict(int)
+
+    def record_stage(self, s):
+        endpoint = _endpoint()
+        if has_app_context() and "stages" in g:
+            # Repeated stages in one request (e.g. per batch) are summed
+            timing = g.stages.setdefault(s.name, [0.0, 0])
+            timing[0] += s.seconds
+            timing[1] += s.rows or 0
+        with self.lock:
+            key = (endpoint, s.name)
+            self.stage_seconds[key] += s.seconds
+            self.stage_calls[key] += 1
+            self.stage_rows[key] += s.rows or 0
+
+    def record_request(self, endpoint, method, status, seconds):
+        bucket = next((i for i, b in enumerate(LATENCY_BUCKETS) if seconds <= b), len(LATENCY_BUCKETS))
+        with self.lock:
+            self.requests[(endpoint, method, status)] += 1
+            self.latency[endpoint][bucket] += 1
+            self.latency_sum[endpoint] += seconds
+
+    def render(self):
+        p = METRIC_PREFIX
+        lines = []
+        with self.lock:
+            lines += [f"# HELP {p}_http_requests_total Requests handled, by route and status.",
+                      f"# TYPE {p}_http_requests_total counter"]
+            for (endpoint, method, status), n in sorted(self.requests.items()):
+                lines.append(f'{p}_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {n}')
+
+            lines += [f"# HELP {p}_http_request_duration_seconds Request latency, by route.",
+                      f"# TYPE {p}_http_request_duration_seconds histogram"]
+            for endpoint, counts in sorted(self.latency.items()):
+                cumulative = 0
+                for le, n in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                    cumulative += n
+                    lines.append(f'{p}_http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+                lines.append(f'{p}_http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {self.latency_sum[endpoint]:.6f}')
+                lines.append(f'{p}_http_request_duration_seconds_count{{endpoint="{endpoint}"}} {cumulative}')
+
+            lines += [f"# HELP {p}_stage_duration_seconds Time spent per pipeline stage, by route.",
+                      f"# TYPE {p}_stage_duration_seconds summary"]
+            for (endpoint, name), seconds in sorted(self.stage_seconds.items()):
+                labels = f'endpoint="{endpoint}",stage="{name}"'
+                lines.append(f"{p}_stage_duration_seconds_sum{{{labels}}} {seconds:.6f}")
+                lines.append(f"{p}_stage_duration_seconds_count{{{labels}}} {self.stage_calls[(endpoint, name)]}")
+
+            lines += [f"# HELP {p}_stage_rows_total Rows processed per pipeline stage, by route.",
+                      f"# TYPE {p}_stage_rows_total counter"]
+            for (endpoint, name), rows in sorted(self.stage_rows.items()):
+                lines.append(f'{p}_stage_rows_total{{endpoint="{endpoint}",stage="{name}"}} {rows}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval and counts folded stacks.
+
+    The output is the folded format read by flamegraph.pl and speedscope:
+    one "outer;...;inner count" line per distinct stack.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(self.counts.items()))
+
+
+def save_profile(profiler):
+    os.makedirs(PROFILES_FOLDER, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    with open(os.path.join(PROFILES_FOLDER, f"{profile_id}.folded"), "w") as f:
+        f.write(profiler.folded())
+
+    # Keep only the newest PROFILE_HISTORY profiles
+    files = sorted((os.path.join(PROFILES_FOLDER, n) for n in os.listdir(PROFILES_FOLDER)),
+                   key=os.path.getmtime)
+    for path in files[:-PROFILE_HISTORY]:
+        os.remove(path)
+    return profile_id
+
+
+def server_timing(stages, total):
+    # Server-Timing: excel_parse;dur=812.4;desc="120000 rows", ..., total;dur=950.2
+    parts = []
+    for name, (seconds, rows) in stages.items():
+        entry = f"{name};dur={seconds * 1000:.1f}"
+        if rows:
+            entry += f';desc="{rows} rows"'
+        parts.append(entry)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def instrument_app(app):
+    """Time every request, attach Server-Timing headers and feed /metrics."""
+
+    @app.before_request
+    def start_timing():
+        g.endpoint = request.endpoint or "unmatched"
+        g.stages = {}
+        g.request_start = time.perf_counter()
+        g.profiler = None
+        if PROFILING and request.args.get("profile") == "1":
+            g.profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @app.after_request
+    def finish_timing(response):
+        if "request_start" not in g:
+            return response
+        total = time.perf_counter() - g.request_start
+        # Streamed bodies (downloads) are produced after this point and not included
+        metrics.record_request(g.endpoint, request.method, response.status_code, total)
+        response.headers["Server-Timing"] = server_timing(g.stages, total)
+        # Lets the browser's Resource Timing API read the header cross-origin
+        response.headers["Timing-Allow-Origin"] = "*"
+        if g.profiler is not None:
+            response.headers["X-Profile-Id"] = save_profile(g.profiler.stop())
+        return response
+
+    return app
@@ -0,0 +1,141 @@
+import os
+import time
+import uuid
+import functools
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, request, jsonify
+
+# Heavy requests run at most this many at a time (override with JOB_WORKERS)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Finished jobs are kept this long for polling, and at most JOB_HISTORY of them
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 600))
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", 200))
+
+ASYNC_FLAG = "async"
+# Routes that can answer as server-sent events take ?stream=1; a queued job can't stream
+STREAM_FLAG = "stream"
+TRUE_VALUES = ("1", "true", "yes")
+
+
+class Job:
+    def __init__(self, description):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.future = None
+        # Captured response of the view: (status code, headers, body bytes)
+        self.result = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error
+        }
+
+
+class JobQueue:
+    def __init__(self, max_workers):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        now = time.time()
+        done = [j.id for j in self._jobs.values() if j.finished is not None]
+        for job_id in done:
+            job = self._jobs[job_id]
+            if now - job.finished > JOB_RESULT_TTL or len(self._jobs) > JOB_HISTORY:
+                del self._jobs[job_id]
+
+    def submit(self, description, fn):
+        job = Job(description)
+        with self._lock:
+            self._purge()
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        with self._lock:
+            if job.status == "cancelled":
+                # Cancelled after the executor picked it up: future.cancel() failed,
+                # so finishing it is up to us, or it would never be purged
+                job.finished = time.time()
+                return
+            job.status = "running"
+            job.started = time.time()
+        try:
+            result, error, status = fn(), None, "finished"
+        except Exception as e:
+            traceback.print_exc()
+            result, error, status = None, str(e), "failed"
+        with self._lock:
+            # A job cancelled while running finishes, but its result is dropped
+            if job.status != "cancelled":
+                job.result, job.error, job.status = result, error, status
+            job.finished = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status in ("queued", "running"):
+                if job.status == "queued" and job.future.cancel():
+                    job.finished = time.time()
+                job.status = "cancelled"
+            return job
+
+    def list(self):
+        with self._lock:
+            self._purge()
+            return [job.to_dict() for job in self._jobs.values()]
+
+
+job_queue = JobQueue(JOB_WORKERS)
+
+
+def submit_view(view, view_args, path, method="GET", query=None, json_body=None):
+    """Queue a view function to run later in its own request context."""
+    app = current_app._get_current_object()
+    query = {k: v for k, v in (query or {}).items() if k != ASYNC_FLAG}
+
+    def run():
+        with app.test_request_context(path, method=method, query_string=query, json=json_body):
+            response = app.make_response(view(**view_args))
+            # Streamed bodies (e.g. downloads) are drained here
+            return response.status_code, dict(response.headers), response.get_data()
+
+    return job_queue.submit(f"{method} {path}", run)
+
+
+def async_capable(view):
+    # Adds ?async=1 to a route: the work is queued and a job id comes back at once
+    @functools.wraps(view)
+    def wrapper(**view_args):
+        if request.args.get(ASYNC_FLAG, "").lower() in TRUE_VALUES:
+            if request.args.get(STREAM_FLAG, "").lower() in TRUE_VALUES:
+                return jsonify({"error": f"?{STREAM_FLAG}=1 cannot be combined with ?{ASYNC_FLAG}=1"}), 400
+            job = submit_view(view, view_args, request.path, request.method,
+                              request.args.to_dict(), request.get_json(silent=True))
+            return jsonify(job.to_dict()), 202
+        return view(**view_args)
+
+    wrapper.async_capable = True
+    return wrapper
@@ -0,0 +1,79 @@
+import os
+import gzip
+import json
+from flask import Response, request
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed (override with COMPRESS_MIN_BYTES)
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+# Set RESPONSE_COMPRESSION=0 to turn gzip/brotli off, e.g. behind a compressing proxy
+RESPONSE_COMPRESSION = os.environ.get("RESPONSE_COMPRESSION", "1") != "0"
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+
+def json_value(value):
+    # Cell values as plain JSON types (numpy scalars, timestamps, NaN)
+    if value is None or (not isinstance(value, (list, dict, str)) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def dumps(payload):
+    """Serialize to UTF-8 JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+                            default=json_value)
+    return json.dumps(payload, separators=(",", ":"), default=json_value).encode("utf-8")
+
+
+def column_values(series):
+    if series.dtype == np.float32:
+        # Shortest float32 repr, not the widened float64 digits
+        return [None if np.isnan(v) else float(str(v)) for v in series.to_numpy()]
+    return [json_value(v) for v in series.tolist()]
+
+
+def columnar(df):
+    # Column names once, then one typed value array per column
+    return {
+        "columns": [str(c) for c in df.columns],
+        "dtypes": [str(t) for t in df.dtypes],
+        "data": [column_values(df[c]) for c in df.columns]
+    }
+
+
+def json_response(payload, status=200):
+    with stage("serialize"):
+        body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+
+    accepted = request.headers.get("Accept-Encoding", "") if RESPONSE_COMPRESSION else ""
+    if len(body) >= COMPRESS_MIN_BYTES:
+        with stage("compress"):
+            if brotli is not None and "br" in accepted:
+                body = brotli.compress(body, quality=BROTLI_QUALITY)
+                headers["Content-Encoding"] = "br"
+            elif "gzip" in accepted:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+                headers["Content-Encoding"] = "gzip"
+
+    return Response(body, status=status, mimetype="application/json", headers=headers)
@@ -0,0 +1,40 @@
+import types
+import importlib
+
+# Modules that make up most of the backend's import time
+HEAVY_MODULES = ["numpy", "pandas", "pyarrow.parquet", "plotly.graph_objects", "faiss",
+                 "joblib", "xgboost", "openpyxl", "requests"]
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for a module until one of its attributes is first used, then imports it.
+
+    importlib's per-module lock makes the first use safe from several threads.
+    Once loaded, the module's attributes are copied in, so later lookups cost
+    the same as on the real module.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._lazy_name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._lazy_name)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    # pd = lazy_import("pandas") instead of import pandas as pd
+    return LazyModule(name)
+
+
+def import_heavy_modules():
+    """Import everything deferred above now; returns the modules that could not be imported."""
+    missing = []
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            missing.append(name)
+    return missing
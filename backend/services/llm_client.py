@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import time
+import tempfile
+import threading
+from services.sheet_cache import SheetCache, register_cache
+from services.lazy_imports import lazy_import
+
+requests = lazy_import("requests")
+
+try:
+    import fcntl
+except ImportError:  # Windows: the concurrency limit then only holds within one process
+    fcntl = None
+
+# Ollama-compatible /api/chat; point OLLAMA_URL at benchmarks/stub_llm.py to run without a model
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/chat")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2")
+# Generations running at once; the local model server slows down for everyone beyond this
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 2))
+# Seconds a question waits for a free slot before the caller gets a 503
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", 30))
+# Lock files for the generation slots, shared by every worker process on the host
+LLM_SLOT_DIR = os.environ.get("LLM_SLOT_DIR", os.path.join(tempfile.gettempdir(), "nuu_llm_slots"))
+LLM_SLOT_POLL = 0.05
+LLM_CONNECT_TIMEOUT = 5
+# Longest silence between two streamed chunks
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", 120))
+LLM_CACHE_MB = int(os.environ.get("LLM_CACHE_MB", 8))
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMBusy(LLMError):
+    pass
+
+
+class SlotLimit:
+    """At most `slots` holders across all processes that use the same directory.
+
+    Each slot is a lock file and holding its flock is holding the slot. The kernel
+    releases the lock when a process dies, so a crashed worker can't leak a slot.
+    """
+
+    def __init__(self, directory, slots):
+        self.directory = directory
+        self.paths = [os.path.join(directory, f"slot-{i}.lock") for i in range(slots)]
+        # Threads of this process queue here instead of all polling the files
+        self.local = threading.BoundedSemaphore(slots)
+
+    def _try_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for path in self.paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def acquire(self, timeout):
+        """Returns a handle for release(), or None if no slot freed up within timeout."""
+        deadline = time.monotonic() + timeout
+        if not self.local.acquire(timeout=timeout):
+            return None
+        if fcntl is None:
+            return -1
+        while True:
+            fd = self._try_lock()
+            if fd is not None:
+                return fd
+            if time.monotonic() >= deadline:
+                self.local.release()
+                return None
+            time.sleep(LLM_SLOT_POLL)
+
+    def release(self, handle):
+        if handle >= 0:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            os.close(handle)
+        self.local.release()
+
+
+class LLMClient:
+    """Streaming chat client over pooled keep-alive connections, with a host-wide concurrency limit."""
+
+    def __init__(self, url=OLLAMA_URL, model=OLLAMA_MODEL, max_concurrency=LLM_MAX_CONCURRENCY,
+                 queue_timeout=LLM_QUEUE_TIMEOUT, slot_dir=LLM_SLOT_DIR):
+        self.url = url
+        self.model = model
+        self.queue_timeout = queue_timeout
+        self.slots = SlotLimit(slot_dir, max_concurrency)
+        self.pool_size = max_concurrency
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        # Created on first use so importing this module stays cheap
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def stream_chat(self, messages, options=None):
+        """Yield the answer text piece by piece as the model generates it.
+
+        Raises LLMBusy when no slot frees up within queue_timeout. The slot is
+        held until the generator finishes or is closed (e.g. the browser left).
+        """
+        slot = self.slots.acquire(self.queue_timeout)
+        if slot is None:
+            raise LLMBusy("AI assistant is busy, try again shortly")
+        try:
+            payload = {"model": self.model, "messages": messages, "options": options or {}, "stream": True}
+            try:
+                with self.session.post(self.url, json=payload, stream=True,
+                                       timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)) as response:
+                    if response.status_code != 200:
+                        raise LLMError(f"LLM server returned {response.status_code}: {response.text[:200]}")
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if "error" in chunk:
+                            raise LLMError(chunk["error"])
+                        piece = chunk["message"].get("content", "") if "message" in chunk else chunk.get("response", "")
+                        if piece:
+                            yield piece
+                        if chunk.get("done"):
+                            return
+            except requests.RequestException as e:
+                raise LLMError(f"LLM server unreachable: {e}") from e
+        finally:
+            self.slots.release(slot)
+
+    def chat(self, messages, options=None):
+        return "".join(self.stream_chat(messages, options))
+
+
+llm_client = LLMClient()
+
+
+def normalize_question(question):
+    # "How many rows?" and "  how many   rows " are the same question
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?.! ")
+
+
+# Answers keyed by content, not path: identical re-uploads share them and an
+# edited file can never hit a stale answer, so nothing needs invalidating.
+# Each worker process has its own cache
+answer_cache = register_cache(
+    "answers",
+    SheetCache(LLM_CACHE_MB * 1024 * 1024, sizeof=lambda entry: len(json.dumps(entry)))
+)
+
+
+def answer_key(content_hash, sheet, question, model):
+    return (content_hash, sheet, normalize_question(question), model)
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+from services.inference import InferenceEngine
+from services.lazy_imports import lazy_import
+
+joblib = lazy_import("joblib")
+
+# Trained artifacts: the pair written by models/model.py is version "current",
+# extra pairs live in models/versions/<name>/ with the same file names
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models")
+VERSIONS_DIR = os.path.join(MODELS_DIR, "versions")
+MODEL_FILE = "churn_model_xgb.joblib"
+PREPROCESSOR_FILE = "preprocessor.joblib"
+
+DEFAULT_VERSION = os.environ.get("MODEL_VERSION", "current")
+# Seconds between checks of the artifacts on disk for a given version
+MODEL_CHECK_INTERVAL = float(os.environ.get("MODEL_CHECK_INTERVAL", 2))
+
+
+def artifact_version(*paths):
+    # Retraining rewrites the joblib files, which changes this version
+    version = []
+    for path in paths:
+        st = os.stat(path)
+        version.append((st.st_mtime_ns, st.st_size))
+    return tuple(version)
+
+
+class ModelBundle:
+    # One loaded model + scaler pair; never mutated once published
+    def __init__(self, name, model, preprocessor, signature):
+        self.name = name
+        self.model = model
+        self.preprocessor = preprocessor
+        self.signature = signature
+        self.engine = InferenceEngine(model, preprocessor)
+        self.loaded_at = time.time()
+
+    @property
+    def version(self):
+        # Hashable key for caches of anything this bundle produced
+        return (self.name,) + self.signature
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "signature": [list(s) for s in self.signature],
+            "loaded_at": self.loaded_at
+        }
+
+
+class ModelNotFound(KeyError):
+    pass
+
+
+class ModelLoadError(Exception):
+    # The artifacts exist but could not be loaded (corrupt or half-written)
+    pass
+
+
+class ModelRegistry:
+    def __init__(self, models_dir=MODELS_DIR, versions_dir=VERSIONS_DIR):
+        self.models_dir = models_dir
+        self.versions_dir = versions_dir
+        self._bundles = {}  # name -> ModelBundle
+        self._checked = {}  # name -> time of last disk check
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def paths(self, name):
+        folder = self.models_dir if name == "current" else os.path.join(self.versions_dir, name)
+        return os.path.join(folder, MODEL_FILE), os.path.join(folder, PREPROCESSOR_FILE)
+
+    def available(self):
+        names = []
+        if all(os.path.exists(p) for p in self.paths("current")):
+            names.append("current")
+        if os.path.isdir(self.versions_dir):
+            for name in sorted(os.listdir(self.versions_dir)):
+                if name != "current" and all(os.path.exists(p) for p in self.paths(name)):
+                    names.append(name)
+        return names
+
+    def get(self, name=None):
+        """Return the bundle for a version, loading or reloading it when the files changed."""
+        name = name or DEFAULT_VERSION
+        if os.sep in name or name in ("", ".", ".."):
+            raise ModelNotFound(name)
+
+        with self._lock:
+            bundle = self._bundles.get(name)
+            fresh = time.time() - self._checked.get(name, 0) < MODEL_CHECK_INTERVAL
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        if bundle is not None and fresh:
+            return bundle
+
+        with load_lock:
+            model_path, preprocessor_path = self.paths(name)
+            try:
+                signature = artifact_version(model_path, preprocessor_path)
+            except FileNotFoundError:
+                if bundle is not None:
+                    return bundle  # files removed: keep serving what is loaded
+                raise ModelNotFound(name)
+
+            with self._lock:
+                self._checked[name] = time.time()
+                bundle = self._bundles.get(name)
+            if bundle is not None and bundle.signature == signature:
+                return bundle
+
+            try:
+                model = joblib.load(model_path)
+                preprocessor = joblib.load(preprocessor_path)
+                new_bundle = ModelBundle(name, model, preprocessor, signature)
+            except Exception as e:
+                # Usually a half-written artifact; the next check retries
+                if bundle is not None:
+                    print(f"Keeping model '{name}', reload failed: {e}")
+                    return bundle
+                raise ModelLoadError(f"Model version {name} could not be loaded: {e}") from e
+
+            # Requests already holding the old bundle finish with it
+            with self._lock:
+                self._bundles[name] = new_bundle
+            return new_bundle
+
+    def loaded(self):
+        with self._lock:
+            return [b.to_dict() for b in self._bundles.values()]
+
+
+model_registry = ModelRegistry()
+
+
+def get_model(name=None):
+    return model_registry.get(name)
@@ -0,0 +1,35 @@
+import os
+from services.sheet_cache import SheetCache, file_signature, register_cache
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Memory budget for scored sheets (override with PREDICTION_CACHE_MB)
+PREDICTION_CACHE_MB = int(os.environ.get("PREDICTION_CACHE_MB", 64))
+
+
+class ScoredSheet:
+    # Model output for every row of a sheet: 4 bytes + 1 byte per row
+    __slots__ = ("proba", "label")
+
+    def __init__(self, proba, label):
+        self.proba = np.ascontiguousarray(proba, dtype=np.float32)
+        self.label = np.ascontiguousarray(label, dtype=np.int8)
+
+    def __len__(self):
+        return len(self.proba)
+
+    @property
+    def nbytes(self):
+        return self.proba.nbytes + self.label.nbytes
+
+
+prediction_cache = register_cache(
+    "predictions",
+    SheetCache(PREDICTION_CACHE_MB * 1024 * 1024, sizeof=lambda scored: scored.nbytes)
+)
+
+
+def get_scored(filepath, sheet, model_version, scorer):
+    key = file_signature(filepath) + (sheet, model_version)
+    return prediction_cache.get_or_load(key, scorer)
@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import zlib
+import threading
+import importlib.util
+from services.sheet_cache import SheetCache, file_signature, register_cache, read_sheet, get_sheet_names
+from services.columnar_store import sheet_artifact_path
+from services.sheet_profile import get_sheet_profile
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+faiss = lazy_import("faiss")
+
+# Sentence embeddings when sentence_transformers is installed, else hashed bag of
+# words (no model download; also what tests use). Override with RETRIEVAL_EMBEDDER.
+HAVE_SENTENCE_TRANSFORMERS = importlib.util.find_spec("sentence_transformers") is not None
+HAVE_FAISS = importlib.util.find_spec("faiss") is not None
+RETRIEVAL_EMBEDDER = os.environ.get(
+    "RETRIEVAL_EMBEDDER", "sentence-transformers/all-MiniLM-L6-v2" if HAVE_SENTENCE_TRANSFORMERS else "hashing"
+)
+HASHING_DIM = 1024
+
+# Rows per row chunk, and at most this many chunks spread evenly over the sheet
+ROW_CHUNK_ROWS = int(os.environ.get("RETRIEVAL_CHUNK_ROWS", 10))
+MAX_ROW_CHUNKS = int(os.environ.get("RETRIEVAL_MAX_CHUNKS", 500))
+# Longest text of one document; wide sheets get truncated row chunks
+MAX_DOC_CHARS = 1500
+# Context handed to the LLM per question
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 8))
+RETRIEVAL_CONTEXT_CHARS = int(os.environ.get("RETRIEVAL_CONTEXT_CHARS", 6000))
+RETRIEVAL_CACHE_MB = int(os.environ.get("RETRIEVAL_CACHE_MB", 128))
+# Bump when the documents change, so persisted indexes are rebuilt
+INDEX_VERSION = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    # Token counts hashed into a fixed number of buckets, L2-normalized
+
+    name = "hashing"
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), HASHING_DIM), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in _TOKEN.findall(text.lower()):
+                vectors[i, zlib.crc32(token.encode("utf-8")) % HASHING_DIM] += 1.0
+        return _normalize(vectors)
+
+
+class SentenceEmbedder:
+    def __init__(self, name):
+        from sentence_transformers import SentenceTransformer
+        self.name = name
+        self.model = SentenceTransformer(name)
+
+    def encode(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=64, convert_to_numpy=True, show_progress_bar=False)
+        return _normalize(vectors.astype(np.float32))
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    # The sentence model takes seconds to load: once per process
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _embedder = HashingEmbedder() if RETRIEVAL_EMBEDDER == "hashing" else SentenceEmbedder(RETRIEVAL_EMBEDDER)
+        return _embedder
+
+
+def _fmt(value):
+    return f"{value:.4g}" if isinstance(value, float) else str(value)
+
+
+def overview_text(sheet, profile):
+    # Always part of the prompt: the shape of the sheet and every column name
+    names = [f"{c} ({p['kind']})" for c, p in profile["columns"].items()]
+    columns = ", ".join(names)
+    if len(columns) > MAX_DOC_CHARS:
+        # Very wide sheets: the column documents carry the rest
+        shown = columns[:MAX_DOC_CHARS].rsplit(", ", 1)[0]
+        columns = f"{shown}, ... ({len(names) - shown.count(', ') - 1} more)"
+    churn = profile.get("churn_column")
+    lines = [f"Sheet {sheet}: {profile['rows']} rows, {len(profile['columns'])} columns.",
+             f"Columns: {columns}"]
+    if churn:
+        lines.append(f"Churn label column: {churn}")
+    return "\n".join(lines)
+
+
+def column_text(name, p):
+    lines = [f"Column {name}: {p['kind']} ({p['dtype']}), {p['nulls']} missing, {p['unique']} distinct values."]
+    if p.get("describe"):
+        stats = ", ".join(f"{k} {_fmt(v)}" for k, v in p["describe"].items() if v is not None)
+        lines.append(f"Statistics: {stats}.")
+    if p["top"]:
+        lines.append("Most common values: " + ", ".join(f"{v} ({n})" for v, n in p["top"]) + ".")
+    by_churn = p.get("by_churn")
+    if by_churn and by_churn.get("type") == "box":
+        for group, box in by_churn["groups"].items():
+            if box:
+                lines.append(f"When churn = {group}: mean {_fmt(box['mean'])}, median {_fmt(box['median'])}, "
+                             f"count {box['count']}.")
+    return "\n".join(lines)[:MAX_DOC_CHARS]
+
+
+def row_chunk_starts(rows):
+    n_chunks = -(-rows // ROW_CHUNK_ROWS)
+    if n_chunks <= MAX_ROW_CHUNKS:
+        return list(range(0, rows, ROW_CHUNK_ROWS))
+    # Long sheets: evenly spaced samples instead of every row
+    return sorted(set(np.linspace(0, rows - ROW_CHUNK_ROWS, MAX_ROW_CHUNKS).astype(int).tolist()))
+
+
+def sheet_documents(filepath, sheet):
+    """(title, text) pairs: one per column profile, plus row chunks."""
+    profile = get_sheet_profile(filepath, sheet)
+    docs = [(f"column {name}", column_text(name, p)) for name, p in profile["columns"].items()]
+
+    df = read_sheet(filepath, sheet, copy=False)
+    for start in row_chunk_starts(len(df)):
+        end = min(start + ROW_CHUNK_ROWS, len(df))
+        text = f"Rows {start + 1}-{end}:\n" + df.iloc[start:end].to_csv(index=False)
+        docs.append((f"rows {start + 1}-{end}", text[:MAX_DOC_CHARS]))
+    return overview_text(sheet, profile), docs
+
+
+class RetrievalIndex:
+    """Embedded documents of one sheet; search returns the closest ones."""
+
+    def __init__(self, overview, titles, texts, vectors):
+        self.overview = overview
+        self.titles = titles
+        self.texts = texts
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.index = None
+        if HAVE_FAISS and len(self.vectors):
+            # Inner product on normalized vectors is cosine similarity
+            self.index = faiss.IndexFlatIP(self.vectors.shape[1])
+            self.index.add(self.vectors)
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes * (2 if self.index is not None else 1) + sum(len(t) for t in self.texts)
+
+    def search(self, question, k=RETRIEVAL_TOP_K):
+        if not len(self):
+            return []
+        query = get_embedder().encode([question])
+        k = min(k, len(self))
+        if self.index is not None:
+            scores, ids = self.index.search(query, k)
+            scores, ids = scores[0], ids[0]
+        else:
+            sims = self.vectors @ query[0]
+            ids = np.argsort(-sims, kind="stable")[:k]
+            scores = sims[ids]
+        return [(int(i), float(s)) for i, s in zip(ids, scores) if i >= 0]
+
+    def context(self, question, k=RETRIEVAL_TOP_K, max_chars=RETRIEVAL_CONTEXT_CHARS):
+        """Overview plus the best-matching documents that fit in max_chars, and their titles."""
+        parts, sources = [self.overview], []
+        used = len(self.overview)
+        for i, _ in self.search(question, k):
+            if used + len(self.texts[i]) > max_chars:
+                continue
+            parts.append(self.texts[i])
+            sources.append(self.titles[i])
+            used += len(self.texts[i])
+        return "\n\n".join(parts), sources
+
+
+def build_retrieval_index(filepath, sheet):
+    overview, docs = sheet_documents(filepath, sheet)
+    titles = [t for t, _ in docs]
+    texts = [d for _, d in docs]
+    with stage("embedding", rows=len(texts)):
+        vectors = get_embedder().encode(texts) if texts else np.zeros((0, HASHING_DIM), dtype=np.float32)
+    return RetrievalIndex(overview, titles, texts, vectors)
+
+
+def load_or_build_index(filepath, sheet):
+    # Persisted next to the sheet's Parquet file: documents as JSON, vectors as .npy
+    meta_path = sheet_artifact_path(filepath, sheet, "retrieval.json")
+    vectors_path = sheet_artifact_path(filepath, sheet, "retrieval.npy")
+    embedder = get_embedder().name
+    if meta_path is not None and os.path.exists(meta_path) and os.path.exists(vectors_path):
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        if meta.get("version") == INDEX_VERSION and meta.get("embedder") == embedder:
+            return RetrievalIndex(meta["overview"], meta["titles"], meta["texts"], np.load(vectors_path))
+
+    index = build_retrieval_index(filepath, sheet)
+    if meta_path is not None:
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, index.vectors)
+        os.replace(vectors_path + ".tmp", vectors_path)
+        meta = {"version": INDEX_VERSION, "embedder": embedder, "overview": index.overview,
+                "titles": index.titles, "texts": index.texts}
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+    return index
+
+
+retrieval_cache = register_cache(
+    "retrieval",
+    SheetCache(RETRIEVAL_CACHE_MB * 1024 * 1024, sizeof=lambda index: index.nbytes)
+)
+
+
+def get_retrieval_index(filepath, sheet):
+    key = file_signature(filepath) + (sheet,)
+    return retrieval_cache.get_or_load(key, lambda: load_or_build_index(filepath, sheet))
+
+
+def index_workbook(filepath):
+    # Ingest step: embed every sheet's documents right after upload
+    for sheet in get_sheet_names(filepath):
+        try:
+            get_retrieval_index(filepath, sheet)
+        except Exception as e:
+            print(f"Retrieval indexing failed for {filepath} [{sheet}]: {e}")
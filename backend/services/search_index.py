@@ -0,0 +1,74 @@
+import os
+import re
+from services.sheet_cache import SheetCache, file_signature, register_cache
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Memory budget for search indexes (override with SEARCH_INDEX_MB)
+SEARCH_INDEX_MB = int(os.environ.get("SEARCH_INDEX_MB", 256))
+
+# Cells are joined with a unit separator and rows with a newline, so a match
+# can never span two cells or two rows
+CELL_SEP = "\x1f"
+ROW_SEP = "\n"
+
+
+class SearchIndex:
+    # All rows of a sheet lowercased into one string, plus where each row starts
+
+    def __init__(self, df):
+        rows = None
+        for col in df.columns:
+            # Object first: date columns keep NaT through fillna("") otherwise
+            cells = (df[col].astype(object).fillna("").astype(str).str.lower()
+                     .str.replace(ROW_SEP, " ", regex=False)
+                     .str.replace(CELL_SEP, " ", regex=False))
+            rows = cells if rows is None else rows + CELL_SEP + cells
+        rows = rows.tolist() if rows is not None else [""] * len(df)
+
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+        self.starts = np.zeros(len(rows), dtype=np.int64)
+        if len(rows) > 1:
+            np.cumsum(lengths[:-1] + len(ROW_SEP), out=self.starts[1:])
+        self.text = ROW_SEP.join(rows)
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def nbytes(self):
+        # Approximation: str storage is 1-4 bytes per character
+        return len(self.text) + self.starts.nbytes
+
+    def search(self, term):
+        """Positions of the rows with a cell containing term (case-insensitive)."""
+        term = term.lower()
+        if not term:
+            return np.arange(len(self), dtype=np.int64)
+        if ROW_SEP in term or CELL_SEP in term:
+            return np.empty(0, dtype=np.int64)
+
+        # Each match swallows the rest of its row, so a row is reported once
+        pattern = re.compile(re.escape(term) + "[^" + ROW_SEP + "]*")
+        hits = np.fromiter((m.start() for m in pattern.finditer(self.text)), dtype=np.int64)
+        return np.searchsorted(self.starts, hits, side="right") - 1
+
+
+search_index_cache = register_cache(
+    "search",
+    SheetCache(SEARCH_INDEX_MB * 1024 * 1024, sizeof=lambda index: index.nbytes)
+)
+
+
+def get_search_index(filepath, sheet, variant, load_frame):
+    # variant separates indexes over different views of one sheet (raw, predictions)
+    key = file_signature(filepath) + (sheet, variant)
+
+    def build():
+        df = load_frame()
+        with stage("search_index", rows=len(df)):
+            return SearchIndex(df)
+
+    return search_index_cache.get_or_load(key, build)
@@ -0,0 +1,186 @@
+import os
+import threading
+from collections import OrderedDict
+from services.columnar_store import load_sheet, ensure_converted, remove_store, parquet_row_count
+from services.lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+# Memory budget for parsed sheets kept in this process (override with SHEET_CACHE_MB)
+SHEET_CACHE_MB = int(os.environ.get("SHEET_CACHE_MB", 512))
+
+
+def file_signature(filepath):
+    # Identifies one version of a file on disk: a re-upload changes mtime/size
+    st = os.stat(filepath)
+    return (os.path.abspath(filepath), st.st_mtime_ns, st.st_size)
+
+
+def frame_nbytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+class SheetCache:
+    def __init__(self, budget_bytes, sizeof=frame_nbytes):
+        self.budget_bytes = budget_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (df, nbytes)
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> lock, so concurrent misses parse only once
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, df):
+        nbytes = self.sizeof(df)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # A frame larger than the whole budget is served but never kept
+            if nbytes > self.budget_bytes:
+                return
+            self._entries[key] = (df, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.budget_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        df = self.get(key)
+        if df is not None:
+            return df
+
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another request may have loaded it while we were waiting
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            try:
+                df = loader()
+                self.put(key, df)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return df
+
+    def invalidate(self, filepath):
+        path = os.path.abspath(filepath)
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == path]
+            for k in stale:
+                self.current_bytes -= self._entries.pop(k)[1]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+sheet_cache = SheetCache(SHEET_CACHE_MB * 1024 * 1024)
+
+# Other per-file caches (e.g. scored predictions) dropped together with the sheets
+_dependent_caches = {}
+
+
+def register_cache(name, cache):
+    _dependent_caches[name] = cache
+    return cache
+
+# Sheet names are tiny, keep them in a plain dict keyed by file signature
+_sheet_names = {}
+_sheet_names_lock = threading.Lock()
+
+
+def read_sheet(filepath, sheet, columns=None, copy=True):
+    # Column subsets are cached separately; Parquet only reads the requested columns
+    columns = list(columns) if columns is not None else None
+    key = file_signature(filepath) + (sheet, tuple(columns) if columns is not None else None)
+    df = sheet_cache.get_or_load(key, lambda: load_sheet(filepath, sheet, columns))
+    # Callers add/drop columns freely, so by default never hand out the cached frame
+    # itself; read-only callers (e.g. slicing one page) pass copy=False
+    return df.copy() if copy else df
+
+
+def get_sheet_names(filepath):
+    sig = file_signature(filepath)
+    with _sheet_names_lock:
+        names = _sheet_names.get(sig)
+    if names is None:
+        manifest = ensure_converted(filepath)
+        if manifest is not None:
+            names = manifest["sheets"]
+        else:
+            xl = pd.ExcelFile(filepath)
+            names = xl.sheet_names
+            xl.close()
+        with _sheet_names_lock:
+            _sheet_names[sig] = names
+    return list(names)
+
+
+def get_sheet_columns(filepath, sheet):
+    # {column: dtype} without loading any data when the sheet is converted
+    manifest = ensure_converted(filepath)
+    if manifest is not None and sheet in manifest["columns"]:
+        return dict(manifest["columns"][sheet])
+    df = read_sheet(filepath, sheet)
+    return {c: str(t) for c, t in df.dtypes.items()}
+
+
+def get_sheet_row_count(filepath, sheet):
+    rows = parquet_row_count(filepath, sheet)
+    if rows is None:
+        rows = len(read_sheet(filepath, sheet, copy=False))
+    return rows
+
+
+def invalidate_file(filepath):
+    path = os.path.abspath(filepath)
+    with _sheet_names_lock:
+        for sig in [s for s in _sheet_names if s[0] == path]:
+            del _sheet_names[sig]
+    for cache in _dependent_caches.values():
+        cache.invalidate(filepath)
+    return sheet_cache.invalidate(filepath)
+
+
+def delete_file_data(filepath):
+    # The upload itself is gone: drop cached frames and its columnar copy
+    remove_store(filepath)
+    return invalidate_file(filepath)
+
+
+def cache_stats():
+    stats = sheet_cache.stats()
+    for name, cache in _dependent_caches.items():
+        stats[name] = cache.stats()
+    return stats
@@ -0,0 +1,114 @@
+import os
+import json
+from services.sheet_cache import SheetCache, file_signature, register_cache, read_sheet, get_sheet_names
+from services.columnar_store import sheet_artifact_path
+from services.column_normalizer import column_frequency
+from services.churn_distribution import churn_breakdown
+from services.json_response import json_value
+from services.instrumentation import stage
+from services.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+CHURN_COLUMNS = ['Chrn Flag', 'Churn', 'Churn Flag']
+
+TOP_K = 10
+HISTOGRAM_BINS = 20
+# Frequency tables are only precomputed for columns with at most this many values
+MAX_FREQUENCY_VALUES = 2000
+SAMPLE_ROWS = 5
+PROFILE_CACHE_MB = int(os.environ.get("PROFILE_CACHE_MB", 32))
+
+
+def find_churn_column(columns):
+    return next((c for c in CHURN_COLUMNS if c in columns), None)
+
+
+def column_kind(series):
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(series):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "datetime"
+    return "text"
+
+
+def profile_column(series, churn=None):
+    kind = column_kind(series)
+    nulls = int(series.isna().sum())
+    unique = int(series.nunique(dropna=True))
+    top = series.value_counts().head(TOP_K)
+
+    profile = {
+        "dtype": str(series.dtype),
+        "kind": kind,
+        "nulls": nulls,
+        "unique": unique,
+        "top": [[json_value(v), int(c)] for v, c in top.items()],
+        "frequency": column_frequency(series) if unique <= MAX_FREQUENCY_VALUES else None
+    }
+
+    if kind == "numeric":
+        finite = series.astype(np.float64)
+        finite = finite[np.isfinite(finite)]
+        desc = series.describe()
+        profile["describe"] = {k: json_value(v) for k, v in desc.items()}
+        if len(finite):
+            counts, edges = np.histogram(finite, bins=HISTOGRAM_BINS)
+            profile["histogram"] = {"counts": counts.tolist(), "edges": edges.tolist()}
+
+    if churn is not None:
+        profile["by_churn"] = churn_breakdown(series, churn, numeric=kind in ("numeric", "bool"))
+    return profile
+
+
+def profile_sheet(df):
+    """Everything the dashboard and the AI summary need about a sheet, computed in one go."""
+    target = find_churn_column(df.columns)
+    churn = pd.to_numeric(df[target], errors="coerce").fillna(0).astype(int) if target else None
+
+    return {
+        "rows": int(len(df)),
+        "churn_column": target,
+        "columns": {str(c): profile_column(df[c], churn) for c in df.columns},
+        "sample_csv": df.head(SAMPLE_ROWS).to_csv(index=False)
+    }
+
+
+def load_or_build_profile(filepath, sheet):
+    path = sheet_artifact_path(filepath, sheet, "profile.json")
+    if path is not None and os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    df = read_sheet(filepath, sheet)
+    with stage("profile", rows=len(df)):
+        profile = profile_sheet(df)
+    if path is not None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+    return profile
+
+
+profile_cache = register_cache(
+    "profiles",
+    SheetCache(PROFILE_CACHE_MB * 1024 * 1024, sizeof=lambda profile: len(json.dumps(profile)))
+)
+
+
+def get_sheet_profile(filepath, sheet):
+    key = file_signature(filepath) + (sheet,)
+    return profile_cache.get_or_load(key, lambda: load_or_build_profile(filepath, sheet))
+
+
+def profile_workbook(filepath):
+    # Ingest step: profile every sheet right after upload
+    for sheet in get_sheet_names(filepath):
+        try:
+            get_sheet_profile(filepath, sheet)
+        except Exception as e:
+            print(f"Profiling failed for {filepath} [{sheet}]: {e}")
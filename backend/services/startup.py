@@ -0,0 +1,38 @@
+import sys
+import time
+from contextlib import contextmanager
+from services.lazy_imports import HEAVY_MODULES
+
+# app.py imports this first, so timings start close to process start
+STARTED = time.perf_counter()
+
+_phases = {}
+_ready = None
+
+
+@contextmanager
+def phase(name):
+    # Time one startup step: with phase("blueprints"): ...
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] = round(time.perf_counter() - start, 4)
+
+
+def startup_complete():
+    global _ready
+    _ready = round(time.perf_counter() - STARTED, 4)
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    print(f"Startup: app ready in {_ready:.2f}s "
+          + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in _phases.items())
+          + f"; heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+
+def startup_report():
+    return {
+        "ready_seconds": _ready,
+        "phases": dict(_phases),
+        "loaded_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+        "deferred_modules": [m for m in HEAVY_MODULES if m not in sys.modules]
+    }
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from services.sheet_cache import invalidate_file
+from services.columnar_store import clone_store
+
+# Partial uploads and the content index live here, outside the uploads folder
+UPLOAD_PARTS_FOLDER = os.path.join(os.getcwd(), "upload_parts")
+CONTENT_INDEX = os.path.join(UPLOAD_PARTS_FOLDER, "content_index.json")
+# Chunk size suggested to clients (override with UPLOAD_CHUNK_MB)
+UPLOAD_CHUNK_BYTES = int(os.environ.get("UPLOAD_CHUNK_MB", 8)) * 1024 * 1024
+# Bytes read from the request per step, which bounds memory per transfer
+UPLOAD_READ_BYTES = 1024 * 1024
+# Unfinished uploads are dropped after this many seconds
+UPLOAD_PART_TTL = int(os.environ.get("UPLOAD_PART_TTL", 24 * 3600))
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+def safe_filename(filename):
+    # Subfolders are allowed, escaping the uploads folder is not
+    name = os.path.normpath(filename or "")
+    if not name or name == "." or os.path.isabs(name) or name.split(os.sep)[0] == "..":
+        raise UploadError(f"Invalid filename '{filename}'")
+    return name
+
+
+def copy_stream(stream, out, hasher, limit=None):
+    """Copy stream into out in UPLOAD_READ_BYTES steps, hashing as it goes; returns bytes copied."""
+    copied = 0
+    while True:
+        data = stream.read(UPLOAD_READ_BYTES)
+        if not data:
+            return copied
+        if limit is not None and copied + len(data) > limit:
+            raise UploadError("Chunk runs past the declared file size")
+        out.write(data)
+        hasher.update(data)
+        copied += len(data)
+
+
+class ContentIndex:
+    """sha256 of every stored upload, so identical content is recognized on re-upload."""
+
+    def __init__(self, path=CONTENT_INDEX):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, index):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _current(filepath, entry):
+        # An entry only counts while the file on disk is still the one that was hashed
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return False
+        return st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
+
+    def store(self, part_path, upload_folder, name, digest):
+        """Move a fully received part to upload_folder/name unless that exact content is already there.
+
+        Returns (deduplicated, source) where source is another stored file with
+        the same content whose converted sheets were reused, if any.
+        """
+        filepath = os.path.join(upload_folder, name)
+        with self.lock:
+            index = self._load()
+            entry = index.get(name)
+            if entry and entry["sha256"] == digest and self._current(filepath, entry):
+                # Same name, same bytes: keep the file, its mtime and everything derived from it
+                os.remove(part_path)
+                return True, None
+
+            source = next((other for other, e in index.items()
+                           if other != name and e["sha256"] == digest
+                           and self._current(os.path.join(upload_folder, other), e)), None)
+
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            os.replace(part_path, filepath)
+            # Drop any parsed sheets of a previous file with the same name
+            invalidate_file(filepath)
+            if source is not None and clone_store(os.path.join(upload_folder, source), filepath) is None:
+                source = None
+
+            st = os.stat(filepath)
+            index[name] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            self._save(index)
+            return False, source
+
+    def digest(self, upload_folder, name):
+        """sha256 of upload_folder/name: from the index while the file is unchanged, else hashed and recorded."""
+        filepath = os.path.join(upload_folder, name)
+        with self.lock:
+            entry = self._load().get(name)
+        if entry and self._current(filepath, entry):
+            return entry["sha256"]
+
+        st = os.stat(filepath)
+        hasher = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for data in iter(lambda: f.read(UPLOAD_READ_BYTES), b""):
+                hasher.update(data)
+        with self.lock:
+            index = self._load()
+            index[name] = {"sha256": hasher.hexdigest(), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            self._save(index)
+        return hasher.hexdigest()
+
+
+content_index = ContentIndex()
+
+
+class ChunkedUpload:
+    def __init__(self, upload_id, filename, size, received=0, created=None):
+        self.id = upload_id
+        self.filename = filename
+        self.size = size
+        self.received = received
+        self.created = created or time.time()
+        self.hasher = None
+        self.lock = threading.Lock()
+
+    @property
+    def part_path(self):
+        return os.path.join(UPLOAD_PARTS_FOLDER, f"{self.id}.part")
+
+    @property
+    def meta_path(self):
+        return os.path.join(UPLOAD_PARTS_FOLDER, f"{self.id}.json")
+
+    @property
+    def complete(self):
+        return self.received == self.size
+
+    def save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"filename": self.filename, "size": self.size,
+                       "received": self.received, "created": self.created}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def refresh(self):
+        # Another worker process may have taken chunks of this upload since
+        try:
+            with open(self.meta_path, "r") as f:
+                received = json.load(f)["received"]
+        except (OSError, ValueError, KeyError):
+            raise UploadError("Upload not found", status=404)
+        if received != self.received:
+            self.received, self.hasher = received, None
+
+    def current_hasher(self):
+        # After a restart the running hash is rebuilt from the bytes already on disk
+        if self.hasher is None:
+            self.hasher = hashlib.sha256()
+            with open(self.part_path, "rb") as f:
+                copy_stream(f, _NullWriter(), self.hasher, limit=self.received)
+        return self.hasher
+
+    def to_dict(self):
+        return {
+            "upload_id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "received": self.received,
+            "chunk_size": UPLOAD_CHUNK_BYTES,
+            "complete": self.complete
+        }
+
+
+class _NullWriter:
+    def write(self, data):
+        pass
+
+
+class UploadManager:
+    """Resumable uploads: chunks are appended at their offset and hashed as they arrive."""
+
+    def __init__(self):
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        if not os.path.isdir(UPLOAD_PARTS_FOLDER):
+            return
+        cutoff = time.time() - UPLOAD_PART_TTL
+        for name in os.listdir(UPLOAD_PARTS_FOLDER):
+            path = os.path.join(UPLOAD_PARTS_FOLDER, name)
+            if name.endswith((".part", ".json")) and path != CONTENT_INDEX and os.path.getmtime(path) < cutoff:
+                self._uploads.pop(os.path.splitext(name)[0], None)
+                os.remove(path)
+
+    def create(self, filename, size):
+        if not isinstance(size, int) or size < 0:
+            raise UploadError("size must be a non-negative number of bytes")
+        upload = ChunkedUpload(uuid.uuid4().hex, safe_filename(filename), size)
+        upload.hasher = hashlib.sha256()
+        with self._lock:
+            self._purge()
+            os.makedirs(UPLOAD_PARTS_FOLDER, exist_ok=True)
+            open(upload.part_path, "wb").close()
+            upload.save_meta()
+            self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id):
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                # Not seen by this process (restart, other worker): resume from disk
+                meta_path = os.path.join(UPLOAD_PARTS_FOLDER, f"{os.path.basename(upload_id)}.json")
+                try:
+                    with open(meta_path, "r") as f:
+                        upload = ChunkedUpload(upload_id, **json.load(f))
+                except (OSError, ValueError):
+                    raise UploadError("Upload not found", status=404)
+                self._uploads[upload_id] = upload
+            return upload
+
+    def write_chunk(self, upload_id, offset, stream):
+        upload = self.get(upload_id)
+        with upload.lock:
+            upload.refresh()
+            if offset != upload.received:
+                # The client resumes from where the server actually is
+                raise UploadError("Chunk offset does not match bytes received", status=409,
+                                  received=upload.received)
+
+            hasher = upload.current_hasher().copy()
+            with open(upload.part_path, "r+b") as out:
+                out.seek(offset)
+                try:
+                    copied = copy_stream(stream, out, hasher, limit=upload.size - offset)
+                except Exception:
+                    # Half-written chunk: cut it off so the retry starts clean
+                    out.truncate(offset)
+                    raise
+                out.truncate(offset + copied)
+
+            upload.hasher = hasher
+            upload.received += copied
+            upload.save_meta()
+            return upload
+
+    def finish(self, upload, upload_folder):
+        """Store a complete upload in upload_folder; returns (sha256, deduplicated, source)."""
+        with upload.lock:
+            upload.refresh()
+            if not upload.complete:
+                raise UploadError("Upload is not complete", status=409, received=upload.received)
+            digest = upload.current_hasher().hexdigest()
+            deduplicated, source = content_index.store(upload.part_path, upload_folder, upload.filename, digest)
+            self.discard(upload.id)
+            return digest, deduplicated, source
+
+    def discard(self, upload_id):
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+        for ext in (".part", ".json"):
+            path = os.path.join(UPLOAD_PARTS_FOLDER, f"{os.path.basename(upload_id)}{ext}")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+upload_manager = UploadManager()
+
+
+def receive_file(stream, upload_folder, name):
+    """Single-request upload: stream to a part file with hashing, then store it like a chunked one."""
+    os.makedirs(UPLOAD_PARTS_FOLDER, exist_ok=True)
+    part_path = os.path.join(UPLOAD_PARTS_FOLDER, f"{uuid.uuid4().hex}.part")
+    hasher = hashlib.sha256()
+    try:
+        with open(part_path, "wb") as out:
+            copy_stream(stream, out, hasher)
+        digest = hasher.hexdigest()
+        deduplicated, source = content_index.store(part_path, upload_folder, name, digest)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return digest, deduplicated, source
@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+from services.model_registry import model_registry, DEFAULT_VERSION
+from services.columnar_store import ensure_converted
+from services.sheet_profile import profile_workbook
+from services.features import featurize_workbook
+from services.lazy_imports import lazy_import, import_heavy_modules
+
+np = lazy_import("numpy")
+
+# Warm-up at startup: unset/0 = none (first requests pay instead),
+# 1 = before serving, background = in a thread while already serving
+WARMUP = os.environ.get("WARMUP", "0")
+# Model versions loaded before serving: comma list, "all", or the default only
+WARMUP_MODELS = os.environ.get("WARMUP_MODELS", "")
+# Set WARMUP_UPLOADS=0 to skip converting/profiling existing uploads
+WARMUP_UPLOADS = os.environ.get("WARMUP_UPLOADS", "1") != "0"
+WARMUP_ROWS = 256
+
+_state = {"status": "not run", "steps": {}, "missing_modules": []}
+_lock = threading.Lock()
+
+
+def model_names():
+    if WARMUP_MODELS == "all":
+        return model_registry.available()
+    return [n.strip() for n in WARMUP_MODELS.split(",") if n.strip()] or [DEFAULT_VERSION]
+
+
+def load_models():
+    """Load every warm-up model version; returns the bundles."""
+    bundles = []
+    for name in model_names():
+        try:
+            bundles.append(model_registry.get(name))
+        except Exception as e:
+            print(f"Warm-up: model '{name}' not loaded: {e}")
+    return bundles
+
+
+def warm_models():
+    # One small prediction per model, so the first real request doesn't pay for
+    # XGBoost's lazy setup (thread pool, predictor buffers)
+    for bundle in load_models():
+        n_features = len(getattr(bundle.preprocessor, "mean_", [])) or 2
+        bundle.engine.predict(np.zeros((WARMUP_ROWS, n_features)))
+
+
+def warm_uploads(upload_folder):
+    # Parquet copies, profiles and features are files, so every worker process shares them
+    if not WARMUP_UPLOADS or not os.path.isdir(upload_folder):
+        return
+    for name in sorted(os.listdir(upload_folder)):
+        filepath = os.path.join(upload_folder, name)
+        if not os.path.isfile(filepath):
+            continue
+        try:
+            if ensure_converted(filepath) is not None:
+                profile_workbook(filepath)
+                featurize_workbook(filepath)
+        except Exception as e:
+            print(f"Warm-up: {name} skipped: {e}")
+
+
+def timed(label, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = round(time.perf_counter() - start, 4)
+    _state["steps"][label] = seconds
+    print(f"Warm-up: {label} took {seconds:.2f}s")
+    return result
+
+
+def run_warmup(upload_folder=None, predict=True):
+    """Import the deferred modules, load (and optionally exercise) the models, prepare uploads.
+
+    predict=False only loads, for processes that fork afterwards.
+    """
+    with _lock:
+        _state["status"] = "running"
+        try:
+            _state["missing_modules"] = timed("imports", import_heavy_modules)
+            timed("models", warm_models if predict else load_models)
+            if upload_folder is not None:
+                timed("uploads", warm_uploads, upload_folder)
+            _state["status"] = "done"
+        except Exception as e:
+            _state["status"] = f"failed: {e}"
+            raise
+    return warmup_state()
+
+
+def start_warmup(upload_folder=None):
+    # Startup hook driven by WARMUP
+    if WARMUP == "1":
+        run_warmup(upload_folder)
+    elif WARMUP == "background":
+        threading.Thread(target=run_warmup, args=(upload_folder,), daemon=True).start()
+
+
+def warmup_state():
+    return {"status": _state["status"], "steps": dict(_state["steps"]),
+            "missing_modules": list(_state["missing_modules"])}
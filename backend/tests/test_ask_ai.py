@@ -0,0 +1,179 @@
+"""/ask_ai_about_sheet against the stub LLM (benchmarks/stub_llm.py).
+
+    cd backend && python -m pytest tests
+"""
+import os
+import sys
+import json
+import threading
+
+os.environ["RETRIEVAL_EMBEDDER"] = "hashing"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+from app import app
+from benchmarks import stub_llm
+from controllers import dashboard_controller
+from services import columnar_store
+from services.instrumentation import metrics
+from services.llm_client import LLMClient, answer_cache
+from services.retrieval_index import get_retrieval_index
+from services.upload_store import content_index
+
+FILE = "ask.xlsx"
+SHEET = "N10"
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = stub_llm.serve(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/chat"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    # 60 rows -> 6 row chunks plus 4 column documents: more than RETRIEVAL_TOP_K
+    folder = tmp_path_factory.mktemp("uploads")
+    df = pd.DataFrame({
+        "Model": [f"N{10 + i % 3}" for i in range(60)],
+        "Sim Country": ["Mexico", "Peru", "Chile", "Brazil"] * 15,
+        "Battery Level": [i * 1.5 for i in range(60)],
+        "Churn": [i % 2 for i in range(60)],
+    })
+    df.to_excel(folder / FILE, sheet_name=SHEET, index=False)
+    return folder
+
+
+@pytest.fixture
+def client(stub_url, workbook, tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboard_controller, "UPLOAD_FOLDER", str(workbook))
+    monkeypatch.setattr(columnar_store, "COLUMNAR_FOLDER", str(workbook / "columnar"))
+    monkeypatch.setattr(content_index, "path", str(workbook / "content_index.json"))
+
+    llm = LLMClient(url=stub_url, model="stub", max_concurrency=1, queue_timeout=0.2,
+                    slot_dir=str(tmp_path / "slots"))
+    sent = []
+    stream_chat = llm.stream_chat
+
+    def recording_stream_chat(messages, options=None):
+        sent.append(messages)
+        return stream_chat(messages, options)
+
+    monkeypatch.setattr(llm, "stream_chat", recording_stream_chat)
+    monkeypatch.setattr(dashboard_controller, "llm_client", llm)
+    answer_cache.clear()
+
+    test_client = app.test_client()
+    test_client.llm, test_client.sent = llm, sent
+    return test_client
+
+
+def ask(client, question, stream=False):
+    url = f"/ask_ai_about_sheet/{FILE}/{SHEET}" + ("?stream=1" if stream else "")
+    return client.post(url, json={"question": question})
+
+
+def events(response):
+    parsed = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def test_prompt_holds_only_retrieved_context(client, workbook):
+    question = "Which Sim Country appears most often?"
+    response = ask(client, question)
+    assert response.status_code == 200
+    body = response.get_json()
+
+    index = get_retrieval_index(str(workbook / FILE), SHEET)
+    context, sources = index.context(question)
+    assert body["sources"] == sources
+    assert "column Sim Country" in sources
+    assert body["cached"] is False
+
+    prompt = client.sent[-1][-1]["content"]
+    assert context in prompt
+    left_out = [text for title, text in zip(index.titles, index.texts) if title not in sources]
+    assert left_out
+    assert not any(text in prompt for text in left_out)
+    assert body["answer"].strip() == f"Stub answer from stub ({len(prompt)} prompt chars): {question}"
+
+
+def test_stream_sends_sources_tokens_done(client):
+    question = "What is the average Battery Level?"
+    parsed = events(ask(client, question, stream=True))
+
+    names = [name for name, _ in parsed]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+    assert parsed[-1][1] == {"cached": False}
+    answer = "".join(data["token"] for name, data in parsed if name == "token")
+    assert answer.strip().endswith(question)
+
+
+def test_repeated_question_is_cached(client):
+    first = ask(client, "How many rows churned?").get_json()
+    # Normalized: case, spacing and trailing punctuation don't matter
+    second = ask(client, "  how many rows   churned ").get_json()
+    assert len(client.sent) == 1
+    assert second["cached"] is True
+    assert second["answer"] == first["answer"] and second["sources"] == first["sources"]
+
+    parsed = events(ask(client, "How many rows churned?", stream=True))
+    assert parsed[-1] == ("done", {"cached": True})
+    assert len(client.sent) == 1
+
+
+def test_busy_when_slots_are_taken(client):
+    slot = client.llm.slots.acquire(0)
+    assert slot is not None
+    try:
+        for stream in (False, True):
+            response = ask(client, "Which Model churns most?", stream=stream)
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "5"
+    finally:
+        client.llm.slots.release(slot)
+    assert ask(client, "Which Model churns most?").status_code == 200
+
+
+def llm_stage_calls():
+    return sum(n for (endpoint, name), n in metrics.stage_calls.items() if name == "llm")
+
+
+def test_stream_closed_early_ends_stage_and_frees_slot(client):
+    calls = llm_stage_calls()
+    url = f"/ask_ai_about_sheet/{FILE}/{SHEET}?stream=1"
+    response = client.post(url, json={"question": "Which Sim Country is last?"}, buffered=False)
+    assert response.status_code == 200
+    assert next(response.response).startswith(b"event: sources")
+    # The browser goes away mid-answer
+    response.close()
+
+    assert llm_stage_calls() == calls + 1
+    slot = client.llm.slots.acquire(0)
+    assert slot is not None
+    client.llm.slots.release(slot)
+
+
+def test_stream_closed_unread_ends_stage_and_frees_slot(client):
+    calls = llm_stage_calls()
+    messages = [{"role": "user", "content": "Which Model is first?"}]
+    with app.test_request_context():
+        response = dashboard_controller.stream_answer("unread", None, messages, [])
+        # Holding the slot until the first event is read
+        assert client.llm.slots.acquire(0) is None
+        response.close()
+
+    assert llm_stage_calls() == calls + 1
+    slot = client.llm.slots.acquire(0)
+    assert slot is not None
+    client.llm.slots.release(slot)
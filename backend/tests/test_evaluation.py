@@ -0,0 +1,78 @@
+"""ScoreHistogram against scikit-learn's metrics on random scores.
+
+    cd backend && python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+from sklearn.metrics import classification_report, confusion_matrix, precision_score, recall_score, roc_auc_score
+
+from services.evaluation import evaluate, EVALUATION_BINS
+from services.inference import THRESHOLD
+from services.prediction_cache import ScoredSheet
+
+ROWS = 20000
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    y = (rng.random(ROWS) < 0.3).astype(float)
+    # Overlapping score distributions, so AUC is neither 0.5 nor 1
+    proba = np.clip(rng.normal(0.35 + 0.25 * y, 0.2), 0, 1)
+    # Rows without a churn label are left out of every metric
+    y[rng.random(ROWS) < 0.05] = np.nan
+    scored = ScoredSheet(proba, proba >= THRESHOLD)
+    # Small chunks, so results are merged across several updates
+    histogram = evaluate(scored, y, chunk_rows=3000)
+    labeled = ~np.isnan(y)
+    return histogram, scored.proba[labeled], scored.label[labeled], y[labeled].astype(int)
+
+
+def test_confusion_and_report_are_exact(data):
+    histogram, _, y_pred, y_true = data
+    assert histogram.rows == len(y_true)
+    assert histogram.confusion.tolist() == confusion_matrix(y_true, y_pred, labels=[0, 1]).tolist()
+
+    expected = classification_report(y_true, y_pred, labels=[0, 1], output_dict=True, zero_division=0)
+    report = histogram.classification_report()
+    assert report.keys() == expected.keys()
+    assert report["accuracy"] == pytest.approx(expected["accuracy"])
+    for key in ("0", "1", "macro avg", "weighted avg"):
+        assert report[key] == pytest.approx(expected[key])
+
+
+def test_roc_auc_within_one_bin(data):
+    histogram, proba, _, y_true = data
+    # Pairs sharing a bin count as ties, so the error is at most half of them
+    same_bin = (histogram.pos * histogram.neg).sum() / (histogram.pos.sum() * histogram.neg.sum())
+    assert abs(histogram.roc_auc() - roc_auc_score(y_true, proba)) <= 0.5 * same_bin + 1e-12
+
+
+def test_sweep_cutoff_is_inclusive_within_one_bin(data):
+    histogram, proba, y_pred, y_true = data
+    width = 1 / EVALUATION_BINS
+    for row in histogram.sweep():
+        t = row["threshold"]
+        at_least, at_most = proba >= t + width, proba >= t - width
+        assert at_least.sum() <= row["predicted_positive"] <= at_most.sum()
+        # Recall only grows as the cutoff drops
+        assert recall_score(y_true, at_least) - 1e-4 <= row["recall"] <= recall_score(y_true, at_most) + 1e-4
+        boundary = at_most.sum() - at_least.sum()
+        exact = precision_score(y_true, proba >= t, zero_division=0)
+        assert abs(row["precision"] - exact) <= boundary / max(row["predicted_positive"], 1) + 1e-4
+
+    # At the model's threshold the sweep matches the engine's labels (>=, not >)
+    row = next(r for r in histogram.sweep() if r["threshold"] == THRESHOLD)
+    assert row["predicted_positive"] == int(y_pred.sum())
+
+
+def test_single_class_has_no_auc():
+    proba = np.linspace(0, 1, 100)
+    histogram = evaluate(ScoredSheet(proba, proba >= THRESHOLD), np.zeros(100))
+    assert histogram.roc_auc() is None
+    assert histogram.classification_report()["1"]["support"] == 0
@@ -0,0 +1,77 @@
+"""/get_sheets_data paging, in both layouts.
+
+    cd backend && python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import app
+from controllers import dashboard_controller
+from services import columnar_store
+
+FILE = "sheet.xlsx"
+SHEET = "N10"
+ROWS = 120
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("uploads")
+    df = pd.DataFrame({
+        "Model": [f"N{10 + i % 3}" for i in range(ROWS)],
+        "Battery Level": [np.nan if i % 7 == 0 else i * 1.5 for i in range(ROWS)],
+        "active_date": [pd.NaT if i % 5 == 0 else pd.Timestamp("2024-01-01 10:00:00") + pd.Timedelta(days=i)
+                        for i in range(ROWS)],
+    })
+    df.to_excel(folder / FILE, sheet_name=SHEET, index=False)
+    return folder
+
+
+@pytest.fixture
+def client(workbook, monkeypatch):
+    monkeypatch.setattr(dashboard_controller, "UPLOAD_FOLDER", str(workbook))
+    monkeypatch.setattr(columnar_store, "COLUMNAR_FOLDER", str(workbook / "columnar"))
+    return app.test_client()
+
+
+def get_page(client, **params):
+    return client.get(f"/get_sheets_data/{FILE}/{SHEET}", query_string={"page": 2, "page_size": 50, **params})
+
+
+def test_records_page(client):
+    response = get_page(client)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["total_rows"] == ROWS and body["total_pages"] == 3
+    assert len(body["preview"]) == 50
+
+    # Page 2 starts at row 50; missing numbers and dates come back as ""
+    assert body["preview"][0] == {"Model": "N12", "Battery Level": "75.0", "active_date": ""}
+    assert body["preview"][1] == {"Model": "N10", "Battery Level": "76.5", "active_date": "2024-02-21 10:00:00"}
+    assert body["preview"][6]["Battery Level"] == ""
+
+
+def test_records_last_page_is_short(client):
+    body = get_page(client, page=3).get_json()
+    assert len(body["preview"]) == ROWS - 100
+
+
+def test_records_search(client):
+    response = get_page(client, page=1, search="n11")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["total_rows"] == ROWS // 3
+    assert len(body["preview"]) == ROWS // 3
+    assert {row["Model"] for row in body["preview"]} == {"N11"}
+
+
+def test_columns_layout(client):
+    response = get_page(client, layout="columns")
+    assert response.status_code == 200
+    assert response.get_json()["total_rows"] == ROWS
@@ -0,0 +1,69 @@
+"""/upload: files are stored under their safe name and ingested in the background.
+
+    cd backend && python -m pytest tests
+"""
+import io
+import os
+import sys
+import time
+
+os.environ["RETRIEVAL_EMBEDDER"] = "hashing"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+from app import app
+from controllers import dashboard_controller, upload_controller
+from services import columnar_store, upload_store
+from services.upload_store import content_index
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    monkeypatch.setattr(upload_controller, "UPLOAD_FOLDER", str(uploads))
+    monkeypatch.setattr(dashboard_controller, "UPLOAD_FOLDER", str(uploads))
+    monkeypatch.setattr(columnar_store, "COLUMNAR_FOLDER", str(tmp_path / "columnar"))
+    monkeypatch.setattr(upload_store, "UPLOAD_PARTS_FOLDER", str(tmp_path / "upload_parts"))
+    monkeypatch.setattr(content_index, "path", str(tmp_path / "upload_parts" / "content_index.json"))
+    return app.test_client()
+
+
+def workbook_bytes():
+    out = io.BytesIO()
+    pd.DataFrame({"Model": ["N10", "N11"], "Churn": [0, 1]}).to_excel(out, sheet_name="N10", index=False)
+    return out.getvalue()
+
+
+def post(client, filename, data):
+    return client.post("/upload", data={"files": (io.BytesIO(data), filename)}, content_type="multipart/form-data")
+
+
+def wait(client, job):
+    deadline = time.time() + 30
+    while job["finished"] is None and time.time() < deadline:
+        time.sleep(0.05)
+        job = client.get(f"/jobs/{job['job_id']}").get_json()
+    return job
+
+
+def test_upload_returns_stored_name_and_ingest_job(client):
+    data = workbook_bytes()
+    response = post(client, "./sub/../book.xlsx", data)
+    assert response.status_code == 200
+    body = response.get_json()
+
+    # The name written to disk, not the raw one the client sent
+    assert body["files"] == ["book.xlsx"]
+    assert "book.xlsx" in client.get("/get_files").get_json()["files"]
+
+    job = wait(client, body["jobs"]["book.xlsx"])
+    assert job["status"] == "finished"
+    assert client.get(f"/jobs/{job['job_id']}/result").get_json() == {"file": "book.xlsx", "sheets": ["N10"]}
+    assert client.get("/get_sheets/book.xlsx").get_json() == {"sheets": ["N10"]}
+
+    # Same content again: nothing to ingest
+    again = post(client, "book.xlsx", data).get_json()
+    assert again["jobs"] == {"book.xlsx": None}
@@ -0,0 +1,15 @@
+# Production entry point: gunicorn -c backend/gunicorn.conf.py (from the repository root)
+#
+# With preload_app the master process imports this module once, so the app,
+# pandas/XGBoost and the loaded model pages are shared copy-on-write by every
+# forked worker instead of being loaded again per worker.
+from app import app
+from controllers.upload_controller import UPLOAD_FOLDER
+from services.warmup import run_warmup
+
+# Import the deferred modules, unpickle the model + scaler pairs and convert
+# existing uploads in the master, before any fork. No predictions here: OpenMP
+# thread pools started in the master don't survive the fork.
+run_warmup(UPLOAD_FOLDER, predict=False)
+
+application = app
@@ -37,16 +37,47 @@ export const DashboardApi = {
         return response.data;
     },
 
-    askAiAboutSheet: async (file, sheet, question) => {
+    // Streamed answer: onToken(text) per generated piece; resolves with the full answer
+    askAiAboutSheetStream: async (file, sheet, question, onToken) => {
         const response = await fetch(
-            `${API_URL}/ask_ai_about_sheet/${file}/${sheet}`,
+            `${API_URL}/ask_ai_about_sheet/${file}/${sheet}?stream=1`,
             {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify({ question })
             }
         );
-        return response.json();
+        // Errors (busy, missing file) and empty questions come back as plain JSON
+        if (!response.headers.get("Content-Type")?.startsWith("text/event-stream")) {
+            const data = await response.json();
+            if (data.error) throw new Error(data.error);
+            onToken(data.answer);
+            return data.answer;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let answer = "";
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            // Events are separated by a blank line
+            const events = buffer.split("\n\n");
+            buffer = events.pop();
+            for (const raw of events) {
+                const event = raw.match(/^event: (.*)$/m)?.[1];
+                const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "null");
+                if (event === "token") {
+                    answer += data.token;
+                    onToken(data.token);
+                } else if (event === "error") {
+                    throw new Error(data.error);
+                }
+            }
+        }
+        return answer;
     },
 
     // ----------------------------
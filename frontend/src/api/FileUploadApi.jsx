@@ -2,16 +2,53 @@ import axios from "axios";
 
 const API_URL = "http://localhost:5001"; // your Flask backend
 
+// Unfinished uploads are remembered so a retry (or page reload) resumes them
+const resumeKey = (file) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+const startOrResume = async (file) => {
+    const saved = localStorage.getItem(resumeKey(file));
+    if (saved) {
+        try {
+            const response = await axios.get(`${API_URL}/uploads/${saved}`);
+            return response.data;
+        } catch (error) {
+            localStorage.removeItem(resumeKey(file));
+        }
+    }
+    const response = await axios.post(`${API_URL}/uploads`, { filename: file.name, size: file.size });
+    localStorage.setItem(resumeKey(file), response.data.upload_id);
+    return response.data;
+};
+
 export const FileUploadApi = {
-    // Upload files
-    upload: async (files) => {
-        const formData = new FormData();
-        files.forEach((file) => formData.append("files", file));
+    // Upload files in chunks; onProgress(fraction) is called as bytes are sent
+    upload: async (files, onProgress) => {
+        const total = files.reduce((sum, file) => sum + file.size, 0) || 1;
+        let done = 0;
+        const uploaded = [];
 
-        const response = await axios.post(`${API_URL}/upload`, formData, {
-        headers: { "Content-Type": "multipart/form-data" },
-        });
+        for (const file of files) {
+            let status = await startOrResume(file);
+            while (!status.complete) {
+                const chunk = file.slice(status.received, status.received + status.chunk_size);
+                try {
+                    const response = await axios.put(
+                        `${API_URL}/uploads/${status.upload_id}`, chunk,
+                        { params: { offset: status.received }, headers: { "Content-Type": "application/octet-stream" } }
+                    );
+                    status = response.data;
+                } catch (error) {
+                    // Offset mismatch: continue from where the server is
+                    if (error.response?.status !== 409) throw error;
+                    status = { ...status, received: error.response.data.received };
+                }
+                if (onProgress) onProgress((done + status.received) / total);
+            }
+            localStorage.removeItem(resumeKey(file));
+            done += file.size;
+            uploaded.push(status.file);
+        }
 
-        return response.data;
+        return { message: "Files uploaded successfully", files: uploaded };
     },
 };
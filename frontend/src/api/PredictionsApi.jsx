@@ -10,8 +10,9 @@ export const PredictionsApi = {
         return response.data;
     },
 
-    downloadPredictions: async (file, sheet) => {
+    downloadPredictions: async (file, sheet, format = "xlsx") => {
         const response = await axios.get(`${API_URL}/download_predictions/${file}/${sheet}`, {
+            params: { format },
             responseType: 'blob',
         });
         return response;
@@ -21,16 +21,25 @@ export default function AiChat({ selectedFile, selectedSheet }) {
     setLoading(true);
 
     try {
-      const response = await DashboardApi.askAiAboutSheet(
+      // Tokens are appended to one assistant message as they arrive
+      let started = false;
+      await DashboardApi.askAiAboutSheetStream(
         selectedFile,
         selectedSheet,
-        input
+        input,
+        (token) => {
+          if (!started) {
+            started = true;
+            setLoading(false);
+            setMessages((prev) => [...prev, { role: "assistant", content: token }]);
+          } else {
+            setMessages((prev) => [
+              ...prev.slice(0, -1),
+              { ...prev[prev.length - 1], content: prev[prev.length - 1].content + token }
+            ]);
+          }
+        }
       );
-
-      setMessages((prev) => [
-        ...prev,
-        { role: "assistant", content: response.answer }
-      ]);
     } catch (err) {
       setMessages((prev) => [
         ...prev,
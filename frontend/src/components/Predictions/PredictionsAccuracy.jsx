@@ -7,6 +7,7 @@ export default function PredictionsAccuracy({ selectedFile, selectedSheet }) {
     const [loading, setLoading] = useState(false);
     const [message, setMessage] = useState("");
     const [error, setError] = useState("");
+    const [cutoff, setCutoff] = useState(null);
 
     useEffect(() => {
         if (!selectedFile || !selectedSheet) return;
@@ -27,6 +28,10 @@ export default function PredictionsAccuracy({ selectedFile, selectedSheet }) {
                 setMetrics(null);
             } else {
                 setMetrics(data);
+                // Start the sweep at the model's own threshold
+                const sweep = data.threshold_sweep || [];
+                const closest = sweep.findIndex((row) => row.threshold >= data.threshold);
+                setCutoff(closest >= 0 ? closest : null);
             }
 
         } catch (err) {
@@ -41,7 +46,8 @@ export default function PredictionsAccuracy({ selectedFile, selectedSheet }) {
     if (message) return <p className="predictions-message">{message}</p>;
     if (!metrics) return null;
 
-    const { classification_report, confusion_matrix, roc_auc } = metrics;
+    const { classification_report, confusion_matrix, roc_auc, threshold_sweep } = metrics;
+    const selected = threshold_sweep && cutoff !== null ? threshold_sweep[cutoff] : null;
 
     return (
         <div className="predictions-accuracy">
@@ -76,6 +82,27 @@ export default function PredictionsAccuracy({ selectedFile, selectedSheet }) {
                 </div>
             </div>
 
+            {selected && (
+                <div className="metric-section">
+                    <h4>Threshold</h4>
+                    <input
+                        type="range"
+                        className="threshold-slider"
+                        min={0}
+                        max={threshold_sweep.length - 1}
+                        value={cutoff}
+                        onChange={(e) => setCutoff(Number(e.target.value))}
+                    />
+                    <p>
+                        <strong>Cutoff:</strong> {selected.threshold.toFixed(2)}{" "}
+                        <strong>Precision:</strong> {selected.precision.toFixed(3)}{" "}
+                        <strong>Recall:</strong> {selected.recall.toFixed(3)}{" "}
+                        <strong>F1:</strong> {selected.f1.toFixed(3)}{" "}
+                        <strong>Flagged:</strong> {selected.predicted_positive}
+                    </p>
+                </div>
+            )}
+
             <div className="metric-section">
                 <h4>Classification Report</h4>
                 <div className="table-scroll">
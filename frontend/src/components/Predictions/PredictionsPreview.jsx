@@ -16,6 +16,7 @@ export default function PredictionsPreview({ selectedFile, selectedSheet }) {
   const [totalPages, setTotalPages] = useState(1);
   const [searchTerm, setSearchTerm] = useState("");
   const [downloading, setDownloading] = useState(false);
+  const [downloadFormat, setDownloadFormat] = useState("xlsx");
 
   const loaderRef = useRef(null);
 
@@ -95,11 +96,14 @@ export default function PredictionsPreview({ selectedFile, selectedSheet }) {
   const handleDownload = async () => {
     setDownloading(true);
     try {
-      const response = await PredictionsApi.downloadPredictions(selectedFile, selectedSheet);
+      const response = await PredictionsApi.downloadPredictions(selectedFile, selectedSheet, downloadFormat);
+      // Server-chosen name, falling back to one matching the requested format
+      const disposition = response.headers["content-disposition"] || "";
+      const filename = disposition.match(/filename="?([^";]+)"?/)?.[1] || `predictions.${downloadFormat}`;
       const url = window.URL.createObjectURL(response.data);
       const a = document.createElement("a");
       a.href = url;
-      a.download = "predictions.xlsx";
+      a.download = filename;
       document.body.appendChild(a);
       a.click();
       a.remove();
@@ -144,6 +148,16 @@ export default function PredictionsPreview({ selectedFile, selectedSheet }) {
             </button>
           </div>
 
+          <select
+            className="download-format"
+            value={downloadFormat}
+            onChange={(e) => setDownloadFormat(e.target.value)}
+            disabled={downloading}
+          >
+            <option value="xlsx">Excel (.xlsx)</option>
+            <option value="csv">CSV (.csv)</option>
+          </select>
+
           <button className="download-button" onClick={handleDownload} disabled={downloading}>
             {downloading ? (
               <CircularProgress color="inherit" size={16} />
@@ -63,9 +63,14 @@ docker exec -ti ollama ollama pull llama3.2
 # docker run -d -v ollama:/root/.ollama -p 11434:11434 --name ollama ollama/ollama
 # docker exec -it ollama ollama pull llama3.2:3b
 
-# Run the backend app.py in the background
-echo "Running backend/app.py..."
-python backend/app.py &
+# Run the backend in the background: PRODUCTION=1 uses gunicorn (Linux/macOS only)
+if [ "$PRODUCTION" = "1" ]; then
+  echo "Running backend with gunicorn..."
+  gunicorn -c backend/gunicorn.conf.py &
+else
+  echo "Running backend/app.py..."
+  python backend/app.py &
+fi
 
 # Navigate to the frontend directory and start React
 echo "Running React frontend..."